@@ -1,7 +1,8 @@
+import itertools
 import os
 import fitz  # PyMuPDF
 import re
-from typing import List, Dict, Any
+from typing import Any, Dict, Iterator, List, Sequence
 from rich.console import Console
 from rich.markdown import Markdown
 from rich.prompt import Prompt
@@ -12,59 +13,106 @@ from rustkissvdb import Client
 # Pretty printing
 console = Console()
 
+_RE_SPACES = re.compile(r'[ \t]+')
+_RE_NEWLINES = re.compile(r'\n{3,}')
+
 def normalize_text(text: str) -> str:
     """Cleans up text formatting."""
     # Replace non-breaking spaces
     text = text.replace("\u00a0", " ")
     # Collapse multiple spaces
-    text = re.sub(r'[ \t]+', ' ', text)
+    text = _RE_SPACES.sub(' ', text)
     # Remove excessive newlines (more than 2)
-    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = _RE_NEWLINES.sub('\n\n', text)
     return text.strip()
 
+def page_blocks(page) -> List[str]:
+    """
+    Text blocks of a page in reading order, each one normalized.
+    MuPDF blocks already are paragraphs, so no re-splitting on blank lines is needed.
+    """
+    # (x0, y0, x1, y1, text, block_no, block_type); block_type 1 = image
+    blocks = [b for b in page.get_text("blocks") if b[6] == 0]
+    blocks.sort(key=lambda b: (b[1], b[0]))
+    return [t for t in (normalize_text(b[4]) for b in blocks) if t]
+
 def semantic_chunking(text: str, max_chunk_size: int = 1000, overlap: int = 200) -> List[str]:
     """
     Chunks text preserving paragraph structure where possible.
-    1. Splits by double newlines (paragraphs).
-    2. Merges paragraphs until max_chunk_size is reached.
-    3. If a single paragraph is too large, splits by sentence/chars (fallback).
-    4. Adds overlap between chunks.
+    Splits by double newlines (paragraphs) and merges them with chunk_paragraphs.
     """
     text = normalize_text(text)
     if not text:
         return []
+    return chunk_paragraphs(text.split('\n\n'), max_chunk_size, overlap)
 
-    paragraphs = text.split('\n\n')
+def chunk_paragraphs(paragraphs: Sequence[str], max_chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+    """
+    1. Merges paragraphs until max_chunk_size is reached.
+    2. If a single paragraph is too large, it becomes its own chunk.
+    3. Adds overlap between chunks.
+    """
     chunks = []
-    current_chunk = ""
+    # Paragraph buffer + running length: join only happens when a chunk is emitted
+    current_parts: List[str] = []
+    current_len = 0  # == len("\n\n".join(current_parts))
 
     for para in paragraphs:
         # If adding this paragraph exceeds max size
-        if len(current_chunk) + len(para) + 2 > max_chunk_size:
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-                # Start new chunk with overlap from previous
-                # Take last 'overlap' chars, but try to keep it clean (not critical for simple implementation)
-                overlap_text = current_chunk[-overlap:] if len(current_chunk) > overlap else current_chunk
-                current_chunk = overlap_text + "\n\n" + para
+        if current_len + len(para) + 2 > max_chunk_size:
+            if current_parts:
+                chunks.append("\n\n".join(current_parts).strip())
+                # Start new chunk with overlap from previous: trailing paragraphs that
+                # fit in 'overlap' chars, or the tail of the last one if none fits
+                keep: List[str] = []
+                kept_len = 0
+                for part in reversed(current_parts):
+                    extra = len(part) + (2 if keep else 0)
+                    if kept_len + extra > overlap:
+                        break
+                    keep.append(part)
+                    kept_len += extra
+                if not keep:
+                    keep = [current_parts[-1][-overlap:]]
+                    kept_len = len(keep[0])
+                keep.reverse()
+                current_parts = keep + [para]
+                current_len = kept_len + 2 + len(para)
             else:
                 # The paragraph itself is huge, we must split it hard
                 # (Simple fallback: just add it, or use fixed size splitter. 
                 # For this demo, we'll just add it to avoid complexity, 
                 # assuming paragraphs aren't massive)
                 chunks.append(para.strip())
-                current_chunk = "" 
         else:
-            if current_chunk:
-                current_chunk += "\n\n" + para
-            else:
-                current_chunk = para
+            current_len += len(para) + (2 if current_parts else 0)
+            current_parts.append(para)
 
-    if current_chunk:
-        chunks.append(current_chunk.strip())
+    if current_parts:
+        chunks.append("\n\n".join(current_parts).strip())
 
     return chunks
 
+def iter_chunks(doc, pdf_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yields upsert-ready chunk records ({"id", "meta"}) page by page,
+    without materializing the whole document's chunks.
+    """
+    source = os.path.basename(pdf_path)
+    for i in range(len(doc)):
+        page_num = i + 1
+        for chunk_idx, chunk_text in enumerate(chunk_paragraphs(page_blocks(doc.load_page(i)))):
+            # Single copy of the chunk text: meta["text"] (snippets are cut at display time)
+            yield {
+                "id": f"p{page_num}_c{chunk_idx}",
+                "meta": {
+                    "source": source,
+                    "page": page_num,
+                    "chunk_index": chunk_idx,
+                    "text": chunk_text,
+                },
+            }
+
 def main():
     console.print("[bold cyan]🤖 RustKissVDB + Ollama PDF RAG Demo[/bold cyan]")
 
@@ -96,6 +144,8 @@ def main():
     client.rag.openai.api_key = OLLAMA_API_KEY
     client.rag.llm_model = CHAT_MODEL
     client.rag.embedding_model = EMBED_MODEL
+    # Interactive loop: reuse answers for near-identical questions (cleared after ingestion below)
+    client.rag.cache_size = 256
 
     # 2. Setup Collection
     with console.status(f"[bold blue]Initializing collection '{COLLECTION}'...[/bold blue]"):
@@ -120,8 +170,6 @@ def main():
         console.print(f"[red]Error opening PDF: {e}[/red]")
         return
 
-    all_chunks_data = []
-
     with Progress(
         SpinnerColumn(),
         TextColumn("[progress.description]{task.description}"),
@@ -129,68 +177,44 @@ def main():
         TaskProgressColumn(),
         console=console
     ) as progress:
-        
-        # Phase 1: Processing Text
-        task_extract = progress.add_task("[cyan]Processing pages...", total=total_pages)
-        
-        for i in range(total_pages):
-            page = doc.load_page(i)
-            text = page.get_text()
-            page_num = i + 1
-            
-            # Semantic chunking
-            page_chunks = semantic_chunking(text)
-            
-            for chunk_idx, chunk_text in enumerate(page_chunks):
-                all_chunks_data.append({
-                    "text": chunk_text,
-                    "meta": {
-                        "source": os.path.basename(PDF_PATH),
-                        "page": page_num,
-                        "chunk_index": chunk_idx,
-                        "text_snippet": chunk_text[:200] + "...",
-                        "full_text": chunk_text
-                    },
-                    "id": f"p{page_num}_c{chunk_idx}"
-                })
-            
-            progress.advance(task_extract)
 
-        # Phase 2: Embedding & Ingestion (Batched)
+        # Chunks stream straight from the pages into the embedding batcher:
+        # only BATCH_SIZE chunks are resident at any time.
         BATCH_SIZE = 10  # Adjust based on memory/model speed
-        total_chunks = len(all_chunks_data)
-        task_ingest = progress.add_task(f"[green]Ingesting {total_chunks} chunks...", total=total_chunks)
-
-        for i in range(0, total_chunks, BATCH_SIZE):
-            batch = all_chunks_data[i : i + BATCH_SIZE]
+        total_chunks = 0
+        task_ingest = progress.add_task("[green]Ingesting pages...", total=total_pages)
+        chunks_iter = iter_chunks(doc, PDF_PATH)
+
+        while True:
+            batch = list(itertools.islice(chunks_iter, BATCH_SIZE))
+            if not batch:
+                break
             
             # Prepare batch for embedding
-            texts_to_embed = [item["text"] for item in batch]
+            texts_to_embed = [item["meta"]["text"] for item in batch]
             
             try:
-                # Generate embeddings in batch
-                embeddings = client.rag.embed(texts_to_embed)
-                
-                # If single vector returned (shouldn't happen with list input but safety check)
-                if isinstance(embeddings, list) and len(embeddings) > 0 and isinstance(embeddings[0], float):
-                    embeddings = [embeddings]
-
-                # Prepare upsert items
-                upsert_items = []
-                for idx, item in enumerate(batch):
-                    upsert_items.append({
-                        "id": item["id"],
-                        "vector": embeddings[idx],
-                        "meta": item["meta"]
-                    })
-                
+                # Generate embeddings in batch: (len(batch), dim) float32 matrix
+                embeddings = client.rag.embed_batch(texts_to_embed)
+
                 # Batch Upsert
-                client.rag.vector_api.upsert_batch(COLLECTION, upsert_items)
+                client.rag.vector_api.upsert_batch_np(
+                    COLLECTION,
+                    [item["id"] for item in batch],
+                    embeddings,
+                    [item["meta"] for item in batch],
+                )
                 
             except Exception as e:
                 console.print(f"[red]Error ingesting batch: {e}[/red]")
             
-            progress.advance(task_ingest, advance=len(batch))
+            total_chunks += len(batch)
+            progress.update(task_ingest, completed=batch[-1]["meta"]["page"])
+
+        progress.update(task_ingest, completed=total_pages)
+
+    # upsert_batch_np does not invalidate the answer cache (only ingest_text does)
+    client.rag.clear_cache(COLLECTION)
 
     console.print(f"[green]Successfully ingested {total_chunks} chunks![/green]")
 
@@ -217,7 +241,7 @@ def main():
             for src in response.sources:
                 page_info = f"Page {src.meta.get('page', '?')}"
                 # Show a bit more context in the source snippet if possible
-                snippet = src.meta.get('full_text', '')[:150].replace('\n', ' ')
+                snippet = (src.content or '')[:150].replace('\n', ' ')
                 console.print(f"- {page_info}: {snippet}... (Score: {src.score:.4f})")
                 
         except Exception as e:
@@ -5,13 +5,16 @@ import os
 import time
 import uuid
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
 
 import httpx
+import numpy as np
 from dotenv import find_dotenv, load_dotenv
 
 from rustkissvdb import Client as RustClient
-from rustkissvdb import RustKissVDBError
+from rustkissvdb import EmbeddingCache, RustKissVDBError
+from rustkissvdb.rag import known_model_dim
 
 # =================================================
 # Load .env
@@ -49,6 +52,15 @@ HISTORY_WINDOW = int(os.getenv("HISTORY_WINDOW", str(DEFAULT_HISTORY_WINDOW)))
 
 CHAT_SESSION_ID = os.getenv("CHAT_SESSION_ID")  # opcional
 
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", ".embed_cache.sqlite")  # "" desactiva el cache
+OLLAMA_EMBED_DIM = int(os.getenv("OLLAMA_EMBED_DIM", "0"))  # 0 = autodetectar
+
+# Cache semántico de preguntas (similitud coseno entre embeddings de la pregunta)
+SEMCACHE_SIZE = int(os.getenv("SEMCACHE_SIZE", "512"))
+SEMCACHE_TTL_S = int(os.getenv("SEMCACHE_TTL_S", "3600"))
+SEMCACHE_ANSWER_SIM = float(os.getenv("SEMCACHE_ANSWER_SIM", "0.95"))
+SEMCACHE_RETRIEVAL_SIM = float(os.getenv("SEMCACHE_RETRIEVAL_SIM", "0.92"))
+
 
 # =================================================
 # Helpers
@@ -115,12 +127,15 @@ class RustKissVDBClient:
     def state_put(self, key: str, value: Any, if_revision: Optional[int] = None) -> Dict[str, Any]:
         return self._client.state.put(key, value=value, if_revision=if_revision)
 
+    def state_batch_put(self, operations: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return self._client.state.batch_put(operations)
+
     def state_delete(self, key: str) -> bool:
         return bool(self._client.state.delete(key))
 
     # ---- vector ----
     def vector_search(
-        self, collection: str, vector: List[float], k: int = 5, include_meta: bool = True
+        self, collection: str, vector: np.ndarray, k: int = 5, include_meta: bool = True
     ) -> Dict[str, Any]:
         return self._client.vector.search(
             collection,
@@ -139,25 +154,71 @@ class RustKissVDBClient:
 # =================================================
 # Ollama clients
 # =================================================
+# Pool keep-alive explícito: cada turno reusa la conexión en vez de re-handshake
+OLLAMA_LIMITS = httpx.Limits(max_keepalive_connections=32, max_connections=64, keepalive_expiry=300)
+
+
 class OllamaEmbeddings:
-    def __init__(self, model: str, base_url: str):
+    def __init__(self, model: str, base_url: str, cache: Optional[EmbeddingCache] = None):
         if not base_url:
             raise ValueError("base_url requerido para OllamaEmbeddings")
         self.model = model
         self.base_url = base_url.rstrip("/")
-        self.http = httpx.Client(timeout=120)
-
-    def embed(self, text: str) -> List[float]:
-        r = self.http.post(
-            f"{self.base_url}/api/embeddings",
-            json={"model": self.model, "prompt": text},
-        )
-        r.raise_for_status()
-        data = r.json()
-        vec = data.get("embedding")
-        if not vec:
-            raise RuntimeError(f"Ollama embeddings sin 'embedding': {data}")
-        return [float(x) for x in vec]
+        self.http = httpx.Client(http2=True, timeout=httpx.Timeout(120, connect=5), limits=OLLAMA_LIMITS)
+        # Cache en disco por (modelo, texto): preguntas repetidas y el dim probe no van a Ollama
+        self.cache = cache
+
+    def close(self) -> None:
+        self.http.close()
+
+    def dim(self) -> int:
+        """
+        Dimensión del modelo: la de la tabla de modelos conocidos, la cacheada si existe;
+        si no, un embed de prueba (que queda cacheado).
+        """
+        known = known_model_dim(self.model)
+        if known:
+            return known
+        if self.cache is not None:
+            cached = self.cache.get_dim(self.model)
+            if cached:
+                return cached
+        dim = len(self.embed("dim_probe"))
+        if self.cache is not None:
+            self.cache.put_dim(self.model, dim)
+        return dim
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.embed_batch([text])[0]
+
+    def embed_batch(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        Embebe varios textos (pregunta + reformulaciones, p.ej.) en una sola llamada a /api/embed.
+        """
+        if not texts:
+            return []
+        if self.cache is not None:
+            out = self.cache.get_many(self.model, texts)
+        else:
+            out = [None] * len(texts)
+        misses = [i for i, v in enumerate(out) if v is None]
+        if misses:
+            todo = [texts[i] for i in misses]
+            r = self.http.post(
+                f"{self.base_url}/api/embed",
+                json={"model": self.model, "input": todo},
+            )
+            r.raise_for_status()
+            data = r.json()
+            vecs = data.get("embeddings")
+            if not vecs or len(vecs) != len(todo):
+                raise RuntimeError(f"Ollama embed sin 'embeddings' (esperaba {len(todo)}): {data}")
+            fresh = list(np.asarray(vecs, dtype=np.float32))
+            for i, vec in zip(misses, fresh):
+                out[i] = vec
+            if self.cache is not None:
+                self.cache.put_many(self.model, todo, fresh)
+        return out  # type: ignore[return-value]
 
 
 class OllamaChat:
@@ -166,18 +227,36 @@ class OllamaChat:
             raise ValueError("base_url requerido para OllamaChat")
         self.model = model
         self.base_url = base_url.rstrip("/")
-        self.http = httpx.Client(timeout=240)
+        self.http = httpx.Client(http2=True, timeout=httpx.Timeout(240, connect=5), limits=OLLAMA_LIMITS)
 
-    def chat(self, system: str, messages: List[Dict[str, str]]) -> str:
+    def close(self) -> None:
+        self.http.close()
+
+    def chat_stream(self, system: str, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """
+        Devuelve los tokens a medida que Ollama los genera (NDJSON, una línea por delta).
+        """
         payload = {
             "model": self.model,
-            "stream": False,
+            "stream": True,
             "messages": [{"role": "system", "content": system}] + messages,
         }
-        r = self.http.post(f"{self.base_url}/api/chat", json=payload)
-        r.raise_for_status()
-        data = r.json()
-        return (data.get("message") or {}).get("content", "")
+        with self.http.stream("POST", f"{self.base_url}/api/chat", json=payload) as r:
+            r.raise_for_status()
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise RuntimeError(f"Ollama chat error: {data['error']}")
+                tok = (data.get("message") or {}).get("content", "")
+                if tok:
+                    yield tok
+                if data.get("done"):
+                    break
+
+    def chat(self, system: str, messages: List[Dict[str, str]]) -> str:
+        return "".join(self.chat_stream(system, messages))
 
 
 # =================================================
@@ -208,12 +287,56 @@ def hits_to_sources(hits: List[Dict[str, Any]]) -> List[SourceHit]:
     return out
 
 
+def rrf_merge(hit_lists: List[List[Dict[str, Any]]], k: int, rrf_k: int = 60) -> List[Dict[str, Any]]:
+    """
+    Reciprocal rank fusion: score(id) = sum(1 / (rrf_k + rank)). Conserva el hit
+    (y su score original) de la primera lista donde aparece cada id.
+    """
+    fused: Dict[str, float] = {}
+    first: Dict[str, Dict[str, Any]] = {}
+    for hits in hit_lists:
+        for rank, h in enumerate(hits, start=1):
+            hid = str(h.get("id"))
+            fused[hid] = fused.get(hid, 0.0) + 1.0 / (rrf_k + rank)
+            first.setdefault(hid, h)
+    ranked = sorted(fused, key=fused.__getitem__, reverse=True)
+    return [first[hid] for hid in ranked[:k]]
+
+
+def retrieve(
+    vdb: RustKissVDBClient, collection: str, qvecs: List[np.ndarray], k: int
+) -> List[Dict[str, Any]]:
+    """
+    Una búsqueda por vector de consulta; con varias (multi-query) se fusionan por RRF.
+    """
+    hit_lists = [vdb.vector_search(collection, v, k=k, include_meta=True).get("hits", []) for v in qvecs]
+    if len(hit_lists) == 1:
+        return hit_lists[0]
+    return rrf_merge(hit_lists, k)
+
+
+# Cota superior de len(header) + "\n" ("[p.999999 | score=-99999.9999]\n")
+_HEADER_MAX_CHARS = 32
+
+
+def _format_block(s: SourceHit) -> str:
+    header = f"[p.{s.page} | score={s.score:.4f}]" if s.page else f"[score={s.score:.4f}]"
+    return f"{header}\n{s.text}".strip()
+
+
 def build_context(sources: List[SourceHit], max_chars: int) -> str:
-    parts = []
-    used = 0
-    for s in sources:
-        header = f"[p.{s.page} | score={s.score:.4f}]" if s.page else f"[score={s.score:.4f}]"
-        block = f"{header}\n{s.text}".strip()
+    if not sources:
+        return ""
+    # Prefijo que cabe seguro según una cota de longitud (suma acumulada vectorizada):
+    # solo se formatea lo que entra y el conteo exacto queda para el borde.
+    est = np.fromiter((len(s.text) for s in sources), dtype=np.int64, count=len(sources))
+    est += _HEADER_MAX_CHARS + 2
+    cutoff = int(np.searchsorted(np.cumsum(est), max_chars, side="right"))
+
+    parts = [_format_block(s) for s in sources[:cutoff]]
+    used = sum(len(b) + 2 for b in parts)
+    for s in sources[cutoff:]:
+        block = _format_block(s)
         if used + len(block) + 2 > max_chars:
             break
         parts.append(block)
@@ -254,53 +377,238 @@ def print_available_collections(vdb: RustKissVDBClient) -> None:
     print()
 
 
+# =================================================
+# Semantic cache (preguntas parafraseadas / repetidas)
+# =================================================
+@dataclass
+class SemanticCacheEntry:
+    qvec: np.ndarray
+    answer: str
+    sources: List[SourceHit]
+    ts: float
+
+
+class SemanticCache:
+    """
+    Cache LRU en memoria indexado por el embedding normalizado de la pregunta.
+
+    Las entradas viven en `max_entries` slots fijos; la matriz de qvecs (una fila por
+    slot) se actualiza en put() y lookup() compara contra todas las entradas vigentes
+    con un único producto matriz-vector. Las expiradas (TTL) se descartan antes de
+    puntuar, y solo un acierto (sim >= min_sim) cuenta como uso para el LRU.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_s: float = 3600.0):
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self._entries: List[Optional[SemanticCacheEntry]] = [None] * self.max_entries
+        self._mat: Optional[np.ndarray] = None  # (max_entries, dim); se crea en el primer put()
+        self._ts = np.full(self.max_entries, -np.inf)  # creación de cada slot; -inf = libre
+        self._used = np.zeros(self.max_entries, dtype=np.int64)  # último uso (orden LRU)
+        self._tick = 0
+
+    @staticmethod
+    def _normalize(vec: np.ndarray) -> np.ndarray:
+        v = np.asarray(vec, dtype=np.float32)
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm > 0 else v
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._ts >= time.time() - self.ttl_s))
+
+    def clear(self) -> None:
+        self._entries = [None] * self.max_entries
+        self._ts.fill(-np.inf)
+
+    def _touch(self, slot: int) -> None:
+        self._tick += 1
+        self._used[slot] = self._tick
+
+    def lookup(self, vec: np.ndarray, min_sim: float) -> Tuple[float, Optional[SemanticCacheEntry]]:
+        """(similitud, entrada) de la entrada vigente más parecida; entrada None si sim < min_sim."""
+        if self._mat is None:
+            return 0.0, None
+        fresh = self._ts >= time.time() - self.ttl_s
+        if not fresh.any():
+            return 0.0, None
+        sims = np.where(fresh, self._mat @ self._normalize(vec), -np.inf)
+        best = int(np.argmax(sims))
+        sim = float(sims[best])
+        if sim < min_sim:
+            return sim, None
+        self._touch(best)
+        return sim, self._entries[best]
+
+    def put(self, vec: np.ndarray, answer: str, sources: List[SourceHit]) -> None:
+        q = self._normalize(vec)
+        if self._mat is None:
+            self._mat = np.zeros((self.max_entries, q.shape[0]), dtype=np.float32)
+        now = time.time()
+        # slot libre o expirado; si no hay, el menos usado recientemente
+        free = np.flatnonzero(self._ts < now - self.ttl_s)
+        slot = int(free[0]) if free.size else int(np.argmin(self._used))
+        self._mat[slot] = q
+        self._entries[slot] = SemanticCacheEntry(q, answer, sources, now)
+        self._ts[slot] = now
+        self._touch(slot)
+
+
 # =================================================
 # Persistent chat memory in VDB state
 # =================================================
 class ChatMemory:
     """
-    Guarda historial persistente en:
-      chat:{session_id}:history
-    Estructura:
-      {"messages":[{"role","content","ts"}...]}
+    Guarda historial persistente en VDB state, un mensaje por key:
+      chat:{session_id}:hist_meta     -> {"count": N, "revision": R}
+      chat:{session_id}:msg:{i:06d}   -> {"role","content","ts","rev"}
+
+    append() solo mueve un mensaje + la meta (CAS sobre la meta reserva el índice),
+    en vez de reenviar todo el historial. `revision` sube en cada clear(): los
+    mensajes con otro `rev` son de un historial anterior y se ignoran, así que
+    limpiar no necesita borrar keys. La ventana de los últimos `history_window`
+    mensajes para el LLM vive en un deque acotado y se lee con state_list por prefijo.
+
+    Sesiones del formato anterior (todo en chat:{session_id}:history) se importan
+    la primera vez que falta hist_meta.
     """
 
-    def __init__(self, vdb: RustKissVDBClient, session_id: str):
+    MAX_CAS_RETRIES = 5
+
+    def __init__(self, vdb: RustKissVDBClient, session_id: str, history_window: int = DEFAULT_HISTORY_WINDOW):
         self.vdb = vdb
         self.session_id = session_id
-        self.key = f"chat:{session_id}:history"
-
-        # init if missing
+        self.meta_key = f"chat:{session_id}:hist_meta"
+        self.msg_prefix = f"chat:{session_id}:msg:"
+        self._count = 0
+        self._hist_rev = 0
+        self._revision: Optional[int] = None
+        self._window: Deque[Dict[str, str]] = deque(maxlen=history_window)
+
+        # init if missing: solo un not_found de la meta crea una sesión nueva; otros
+        # errores (conexión, state_list...) se propagan en vez de pisar el historial
         try:
-            self.vdb.state_get(self.key)
-        except Exception:
-            self.vdb.state_put(self.key, {"messages": []})
-
-    def load(self) -> List[Dict[str, str]]:
-        it = self.vdb.state_get(self.key)
+            self._read_meta()
+        except RustKissVDBError as exc:
+            if "not_found" not in str(exc):
+                raise
+            self._create_meta()
+        self._load_window()
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @staticmethod
+    def _as_turn(m: Any) -> Optional[Dict[str, str]]:
+        if isinstance(m, dict) and "role" in m and "content" in m:
+            return {"role": str(m["role"]), "content": str(m["content"])}
+        return None
+
+    def _msg_key(self, i: int) -> str:
+        return f"{self.msg_prefix}{i:06d}"
+
+    def _read_meta(self) -> None:
+        it = self.vdb.state_get(self.meta_key)
         data = it.value or {}
-        msgs = data.get("messages", [])
-        out: List[Dict[str, str]] = []
-        for m in msgs:
-            if isinstance(m, dict) and "role" in m and "content" in m:
-                out.append({"role": str(m["role"]), "content": str(m["content"])})
-        return out
+        self._count = int(data.get("count", 0))
+        self._hist_rev = int(data.get("revision", 0))
+        self._revision = it.revision
+
+    def _create_meta(self) -> None:
+        legacy_key = f"chat:{self.session_id}:history"
+        try:
+            legacy = self.vdb.state_get(legacy_key).value
+        except RustKissVDBError as exc:
+            if "not_found" not in str(exc):
+                raise
+            legacy = None
+        messages = legacy.get("messages", []) if isinstance(legacy, dict) else []
+        turns = [m for m in messages if self._as_turn(m) is not None]
+        ops = [{"key": self._msg_key(i), "value": {**m, "rev": 0}} for i, m in enumerate(turns)]
+        # lotes chicos: cada mensaje puede pesar hasta 64KB y el body tiene tope de 1MB
+        for i in range(0, len(ops), 16):
+            self.vdb.state_batch_put(ops[i : i + 16])
+        # la meta va después de los mensajes: si algo falla antes, se reintenta la importación
+        res = self.vdb.state_put(self.meta_key, {"count": len(ops), "revision": 0})
+        self._count = len(ops)
+        self._hist_rev = 0
+        self._revision = int(res["revision"])
+        if legacy is not None:
+            self.vdb.state_delete(legacy_key)
+
+    def _load_window(self) -> None:
+        self._window.clear()
+        if self._window.maxlen:
+            self._window.extend(self._fetch(max(0, self._count - self._window.maxlen), self._count))
+
+    def _refresh(self) -> None:
+        self._read_meta()
+        self._load_window()
+
+    def _fetch(self, start: int, end: int) -> List[Dict[str, str]]:
+        """
+        Mensajes [start, end) del historial actual. Cada state_list cubre un bloque
+        de índices que comparten prefijo decimal (10 o 1000 keys), no todo el historial.
+        """
+        if start >= end:
+            return []
+        digits = 1 if end - start <= 100 else 3
+        size = 10**digits
+        by_idx: Dict[int, Dict[str, Any]] = {}
+        for block in range(start // size, (end - 1) // size + 1):
+            prefix = self._msg_key(block * size)[:-digits]
+            for it in self.vdb.state_list(prefix=prefix, limit=size):
+                i = int(it.key[len(self.msg_prefix) :])
+                if start <= i < end and isinstance(it.value, dict) and it.value.get("rev") == self._hist_rev:
+                    by_idx[i] = it.value
+        return [t for t in (self._as_turn(by_idx.get(i)) for i in range(start, end)) if t is not None]
+
+    def _cas_meta(self, count: int, hist_rev: int) -> bool:
+        try:
+            res = self.vdb.state_put(
+                self.meta_key, {"count": count, "revision": hist_rev}, if_revision=self._revision
+            )
+        except RustKissVDBError as exc:
+            if "revision" not in str(exc).lower():
+                raise
+            return False
+        self._count = count
+        self._hist_rev = hist_rev
+        self._revision = int(res["revision"])
+        return True
+
+    def load(self, last: Optional[int] = None) -> List[Dict[str, str]]:
+        """Historial completo (o los últimos `last` mensajes) leído de la VDB."""
+        self._read_meta()
+        start = 0 if last is None else max(0, self._count - last)
+        return self._fetch(start, self._count)
+
+    def window(self) -> List[Dict[str, str]]:
+        """Últimos `history_window` mensajes, sin ir a la VDB."""
+        return list(self._window)
+
+    def set_window(self, history_window: int) -> None:
+        self._window = deque(maxlen=history_window)
+        self._refresh()
 
     def append(self, role: str, content: str) -> None:
-        it = self.vdb.state_get(self.key)
-        data = it.value or {"messages": []}
-        data.setdefault("messages", [])
-        data["messages"].append({"role": role, "content": content, "ts": now_ts()})
-        self.vdb.state_put(self.key, data, if_revision=it.revision)
+        for _ in range(self.MAX_CAS_RETRIES):
+            idx = self._count
+            if self._cas_meta(idx + 1, self._hist_rev):
+                msg = {"role": role, "content": content, "ts": now_ts(), "rev": self._hist_rev}
+                self.vdb.state_put(self._msg_key(idx), msg)
+                self._window.append({"role": role, "content": content})
+                return
+            self._refresh()
+        raise RuntimeError("No pude guardar mensaje (CAS contention).")
 
     def clear(self) -> None:
-        for _ in range(5):
-            it = self.vdb.state_get(self.key)
-            try:
-                self.vdb.state_put(self.key, {"messages": []}, if_revision=it.revision)
+        for _ in range(self.MAX_CAS_RETRIES):
+            if self._cas_meta(0, self._hist_rev + 1):
+                self._window.clear()
                 return
-            except RustKissVDBError:
-                time.sleep(0.05)
+            time.sleep(0.05)
+            self._read_meta()
         raise RuntimeError("No pude limpiar historial (CAS contention).")
 
 
@@ -327,178 +635,207 @@ def main():
     vdb = RustKissVDBClient(base_url=VDB_BASE_URL, api_key=RUSTKISS_API_KEY)
     vdb.health()
 
-    emb = OllamaEmbeddings(model=OLLAMA_EMBED_MODEL, base_url=OLLAMA_BASE_URL)
+    cache = EmbeddingCache(EMBED_CACHE_PATH) if EMBED_CACHE_PATH else None
+    emb = OllamaEmbeddings(model=OLLAMA_EMBED_MODEL, base_url=OLLAMA_BASE_URL, cache=cache)
     llm = OllamaChat(model=OLLAMA_CHAT_MODEL, base_url=OLLAMA_BASE_URL)
 
-    mem = ChatMemory(vdb=vdb, session_id=session_id)
-
-    # manifest check
     try:
-        manifest = load_manifest(vdb, collection)
-        if manifest:
-            print(
-                f"📌 Manifest: chunks={manifest.get('chunks')} "
-                f"embed_model={manifest.get('embed_model')} pdf={manifest.get('pdf_path')}"
-            )
-    except Exception:
-        print(f"❌ No encuentro docs:{collection}:manifest. ¿VDB_COLLECTION correcto?")
-        print_available_collections(vdb)
-        return
+        mem = ChatMemory(vdb=vdb, session_id=session_id, history_window=history_window)
+        semcache = SemanticCache(max_entries=SEMCACHE_SIZE, ttl_s=SEMCACHE_TTL_S)
 
-    try:
-        vector_info = vdb.vector_info(collection)
-        if vector_info.get("count") is not None:
-            print(
-                f"📊 Vector info: count={vector_info.get('count')} "
-                f"dim={vector_info.get('dim')} metric={vector_info.get('metric')}"
-            )
-    except Exception:
-        vector_info = None
-
-    try:
-        available = vdb.vector_list()
-        names = {c.get("collection") for c in available if c.get("collection")}
-        if names and collection not in names:
-            print(f"❌ Colección '{collection}' no existe en vector store.")
+        # manifest check
+        try:
+            manifest = load_manifest(vdb, collection)
+            if manifest:
+                print(
+                    f"📌 Manifest: chunks={manifest.get('chunks')} "
+                    f"embed_model={manifest.get('embed_model')} pdf={manifest.get('pdf_path')}"
+                )
+        except Exception:
+            print(f"❌ No encuentro docs:{collection}:manifest. ¿VDB_COLLECTION correcto?")
             print_available_collections(vdb)
             return
-    except Exception:
-        pass
 
-    # dim check (fail-fast)
-    try:
-        dim = len(emb.embed("dim_probe"))
-        expected_dim = manifest.get("dim") if isinstance(manifest, dict) else None
-        if expected_dim and int(expected_dim) != dim:
-            print(f"❌ DIM mismatch: embedder dim={dim} != manifest dim={expected_dim}")
+        try:
+            vector_info = vdb.vector_info(collection)
+            if vector_info.get("count") is not None:
+                print(
+                    f"📊 Vector info: count={vector_info.get('count')} "
+                    f"dim={vector_info.get('dim')} metric={vector_info.get('metric')}"
+                )
+        except Exception:
+            vector_info = None
+
+        try:
+            available = vdb.vector_list()
+            names = {c.get("collection") for c in available if c.get("collection")}
+            if names and collection not in names:
+                print(f"❌ Colección '{collection}' no existe en vector store.")
+                print_available_collections(vdb)
+                return
+        except Exception:
+            pass
+
+        # dim check (fail-fast)
+        try:
+            dim = OLLAMA_EMBED_DIM or emb.dim()
+            expected_dim = manifest.get("dim") if isinstance(manifest, dict) else None
+            if expected_dim and int(expected_dim) != dim:
+                print(f"❌ DIM mismatch: embedder dim={dim} != manifest dim={expected_dim}")
+                return
+        except Exception as e:
+            print(f"❌ Embeddings fallaron: {e}")
             return
-    except Exception as e:
-        print(f"❌ Embeddings fallaron: {e}")
-        return
 
-    print("✅ Chat RAG listo.")
-    print(f"   vdb={VDB_BASE_URL} | collection='{collection}' | topk={rag_topk} | ctx_chars={max_ctx_chars}")
-    print(f"   ollama={OLLAMA_BASE_URL} | embed='{OLLAMA_EMBED_MODEL}' | chat='{OLLAMA_CHAT_MODEL}'")
-    print(f"   session={session_id}")
-    print("Comandos:")
-    print("  /exit, /clear, /history, /stats, /session, /sources")
-    print("  /set topk N, /set chars N, /set window N\n")
+        print("✅ Chat RAG listo.")
+        print(f"   vdb={VDB_BASE_URL} | collection='{collection}' | topk={rag_topk} | ctx_chars={max_ctx_chars}")
+        print(f"   ollama={OLLAMA_BASE_URL} | embed='{OLLAMA_EMBED_MODEL}' | chat='{OLLAMA_CHAT_MODEL}'")
+        print(f"   session={session_id}")
+        print("Comandos:")
+        print("  /exit, /clear, /history, /stats, /session, /sources")
+        print("  /set topk N, /set chars N, /set window N\n")
 
-    last_sources: List[SourceHit] = []
-    manifest_cached = manifest
+        last_sources: List[SourceHit] = []
+        manifest_cached = manifest
 
-    while True:
-        q = input("tú> ").strip()
-        if not q:
-            continue
+        while True:
+            q = input("tú> ").strip()
+            if not q:
+                continue
 
-        # commands
-        if q.lower() in ("/exit", "exit", "quit"):
-            break
+            # commands
+            if q.lower() in ("/exit", "exit", "quit"):
+                break
 
-        if q.lower() == "/clear":
-            mem.clear()
-            print("🧼 historial (persistente) limpiado.\n")
-            continue
+            if q.lower() == "/clear":
+                mem.clear()
+                print("🧼 historial (persistente) limpiado.\n")
+                continue
 
-        if q.lower() == "/history":
-            h = mem.load()
-            for m in h[-30:]:
-                print(f"{m['role']}: {m['content']}")
-            print()
-            continue
+            if q.lower() == "/history":
+                h = mem.load(last=30)
+                for m in h:
+                    print(f"{m['role']}: {m['content']}")
+                print()
+                continue
 
-        if q.lower() == "/stats":
-            h = mem.load()
-            print(
-                f"session={session_id} messages={len(h)} topk={rag_topk} ctx_chars={max_ctx_chars} window={history_window}"
-            )
-            if manifest_cached:
-                print("manifest:", short(safe_json(manifest_cached), 250))
-            print()
-            continue
-
-        if q.lower() == "/session":
-            print(f"CHAT_SESSION_ID={session_id}")
-            print(f"state_key=chat:{session_id}:history\n")
-            continue
-
-        if q.lower() == "/sources":
-            if not last_sources:
-                print("(aún no hay fuentes)\n")
-            else:
-                for i, s in enumerate(last_sources[:10], start=1):
-                    p = f"p.{s.page}" if s.page else "p.?"
-                    print(f"{i}. {p} score={s.score:.4f} | {short(s.text, 140)}")
+            if q.lower() == "/stats":
+                print(
+                    f"session={session_id} messages={mem.count} topk={rag_topk} ctx_chars={max_ctx_chars} window={history_window}"
+                )
+                print(f"semcache={len(semcache)}/{semcache.max_entries}")
+                if manifest_cached:
+                    print("manifest:", short(safe_json(manifest_cached), 250))
                 print()
-            continue
-
-        if q.lower().startswith("/set "):
-            parts = q.split()
-            if len(parts) == 3:
-                key, val = parts[1].lower(), parts[2]
-                try:
-                    n = int(val)
-                    if key == "topk":
-                        rag_topk = clamp_int(n, 1, 50)
-                        print(f"ok topk={rag_topk}\n")
-                        continue
-                    if key == "chars":
-                        max_ctx_chars = clamp_int(n, 800, 20000)
-                        print(f"ok ctx_chars={max_ctx_chars}\n")
-                        continue
-                    if key == "window":
-                        history_window = clamp_int(n, 2, 50)
-                        print(f"ok window={history_window}\n")
-                        continue
-                except Exception:
-                    pass
-            print("uso: /set topk N | /set chars N | /set window N\n")
-            continue
-
-        # normal flow
-        mem.append("user", q)
+                continue
 
-        try:
-            qvec = emb.embed(q)
-            res = vdb.vector_search(collection, qvec, k=rag_topk, include_meta=True)
-        except RustKissVDBError as e:
-            if "HTTP 404" in str(e):
-                print(f"❌ colección '{collection}' no existe (¿VDB_COLLECTION correcto?).\n")
+            if q.lower() == "/session":
+                print(f"CHAT_SESSION_ID={session_id}")
+                print(f"state_key=chat:{session_id}:hist_meta\n")
                 continue
-            print(f"❌ VDB error: {e}\n")
-            continue
-        except Exception as e:
-            print(f"❌ Embeddings/retrieval falló: {e}\n")
-            continue
-
-        hits = res.get("hits", [])
-        sources = hits_to_sources(hits)
-        last_sources = sources
-
-        ctx = build_context(sources, max_chars=max_ctx_chars)
-
-        system = (
-            "Eres un asistente en español.\n"
-            "Reglas:\n"
-            "1) Usa el CONTEXTO cuando sea relevante.\n"
-            "2) Si el contexto NO alcanza, dilo explícitamente (no inventes).\n"
-            "3) Cuando cites, indica página (p.X).\n\n"
-            f"CONTEXTO:\n{ctx if ctx else '(vacío)'}\n"
-        )
 
-        history = mem.load()
-        window = history[-history_window:]
+            if q.lower() == "/sources":
+                if not last_sources:
+                    print("(aún no hay fuentes)\n")
+                else:
+                    for i, s in enumerate(last_sources[:10], start=1):
+                        p = f"p.{s.page}" if s.page else "p.?"
+                        print(f"{i}. {p} score={s.score:.4f} | {short(s.text, 140)}")
+                    print()
+                continue
 
-        try:
-            ans = llm.chat(system=system, messages=window)
-        except Exception as e:
-            ans = f"[error] Ollama chat falló: {e}"
+            if q.lower().startswith("/set "):
+                parts = q.split()
+                if len(parts) == 3:
+                    key, val = parts[1].lower(), parts[2]
+                    try:
+                        n = int(val)
+                        if key == "topk":
+                            rag_topk = clamp_int(n, 1, 50)
+                            semcache.clear()  # las fuentes cacheadas usan el topk anterior
+                            print(f"ok topk={rag_topk}\n")
+                            continue
+                        if key == "chars":
+                            max_ctx_chars = clamp_int(n, 800, 20000)
+                            semcache.clear()  # las respuestas cacheadas usan el contexto anterior
+                            print(f"ok ctx_chars={max_ctx_chars}\n")
+                            continue
+                        if key == "window":
+                            history_window = clamp_int(n, 2, 50)
+                            mem.set_window(history_window)
+                            print(f"ok window={history_window}\n")
+                            continue
+                    except Exception:
+                        pass
+                print("uso: /set topk N | /set chars N | /set window N\n")
+                continue
 
-        print(f"bot> {ans}")
-        print(f"{format_sources_footer(sources)}\n")
+            # normal flow
+            mem.append("user", q)
 
-        mem.append("assistant", ans)
+            try:
+                # Variantes de la pregunta (reformulaciones, HyDE...) se añaden aquí: 1 sola llamada a Ollama
+                queries = [q]
+                qvecs = emb.embed_batch(queries)
+                qvec = qvecs[0]
+                sim, cached = semcache.lookup(qvec, min_sim=min(SEMCACHE_ANSWER_SIM, SEMCACHE_RETRIEVAL_SIM))
+                if cached is not None and sim >= SEMCACHE_ANSWER_SIM:
+                    last_sources = cached.sources
+                    print(f"bot> {cached.answer}")
+                    print(f"{format_sources_footer(cached.sources)} (cache sim={sim:.3f})\n")
+                    mem.append("assistant", cached.answer)
+                    continue
+                if cached is not None:
+                    sources = cached.sources
+                else:
+                    sources = hits_to_sources(retrieve(vdb, collection, qvecs, rag_topk))
+            except RustKissVDBError as e:
+                if "HTTP 404" in str(e):
+                    print(f"❌ colección '{collection}' no existe (¿VDB_COLLECTION correcto?).\n")
+                    continue
+                print(f"❌ VDB error: {e}\n")
+                continue
+            except Exception as e:
+                print(f"❌ Embeddings/retrieval falló: {e}\n")
+                continue
+
+            last_sources = sources
+
+            ctx = build_context(sources, max_chars=max_ctx_chars)
+
+            system = (
+                "Eres un asistente en español.\n"
+                "Reglas:\n"
+                "1) Usa el CONTEXTO cuando sea relevante.\n"
+                "2) Si el contexto NO alcanza, dilo explícitamente (no inventes).\n"
+                "3) Cuando cites, indica página (p.X).\n\n"
+                f"CONTEXTO:\n{ctx if ctx else '(vacío)'}\n"
+            )
+
+            window = mem.window()
+
+            print("bot> ", end="", flush=True)
+            chunks: List[str] = []
+            try:
+                for tok in llm.chat_stream(system=system, messages=window):
+                    print(tok, end="", flush=True)
+                    chunks.append(tok)
+                ans = "".join(chunks)
+                semcache.put(qvec, ans, sources)
+            except Exception as e:
+                err = f"[error] Ollama chat falló: {e}"
+                print(err, end="")
+                ans = "".join(chunks) + err
+
+            print()
+            print(f"{format_sources_footer(sources)}\n")
+
+            mem.append("assistant", ans)
+    finally:
+        emb.close()
+        llm.close()
+        if cache is not None:
+            cache.close()
 
 
 if __name__ == "__main__":
@@ -1,13 +1,19 @@
+import asyncio
+import hashlib
 import os
 import re
-import uuid
-from typing import Any, Dict, List, Optional
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
 
 import fitz  # PyMuPDF
 import httpx
+import numpy as np
 
 from rustkissvdb import Client as RustClient
-from rustkissvdb import RustKissVDBError
+from rustkissvdb import EmbeddingCache, RustKissVDBError
+from rustkissvdb.rag import known_model_dim
 
 # ---------------------------
 #  RustKissVDB minimal client
@@ -25,9 +31,23 @@ class RustKissVDBClient:
         self._client.request("GET", "/v1/health")
         return True
 
+    def state_get(self, key: str) -> Optional[Any]:
+        try:
+            return self._client.state.get(key).get("value")
+        except RustKissVDBError as exc:
+            if "not_found" not in str(exc):
+                raise
+            return None
+
     def state_put(self, key: str, value: Any) -> Dict[str, Any]:
         return self._client.state.put(key, value=value)
 
+    def state_batch_put(self, operations: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return self._client.state.batch_put(operations)
+
+    def state_delete(self, key: str) -> bool:
+        return self._client.state.delete(key)
+
     def vector_create(self, collection: str, dim: int, metric: str = "cosine") -> None:
         try:
             self._client.vector.create_collection(collection, dim=dim, metric=metric)
@@ -35,13 +55,19 @@ class RustKissVDBClient:
             if "already_exists" not in str(exc):
                 raise
 
-    def vector_upsert(self, collection: str, _id: str, vector: List[float], meta: Any) -> None:
-        self._client.vector.upsert(
-            collection,
-            vector_id=_id,
-            vector=vector,
-            meta=meta,
-        )
+    def vector_upsert_batch(
+        self, collection: str, items: List[Dict[str, Any]], decimals: Optional[int] = None
+    ) -> None:
+        self._client.vector.upsert_batch(collection, items, decimals=decimals)
+
+    def vector_delete_batch(self, collection: str, ids: List[str]) -> None:
+        self._client.vector.delete_batch(collection, ids)
+
+    def vector_search_ids(
+        self, collection: str, vector: np.ndarray, k: int, filters: Optional[Dict[str, Any]] = None
+    ) -> List[str]:
+        data = self._client.vector.search(collection, vector, k=k, include_meta=False, filters=filters)
+        return [h["id"] for h in data.get("hits", [])]
 
 
 # ---------------------------
@@ -49,20 +75,126 @@ class RustKissVDBClient:
 # ---------------------------
 
 
+# Pool keep-alive compartido: evita re-handshake TCP entre lotes y deja margen a la concurrencia
+OLLAMA_TIMEOUT = httpx.Timeout(120, connect=5)
+OLLAMA_LIMITS = httpx.Limits(max_keepalive_connections=32, max_connections=64, keepalive_expiry=300)
+
+
 class OllamaEmbeddings:
-    def __init__(self, model: str = "embeddinggemma:300m", base_url: str = "http://localhost:11434"):
+    """
+    Devuelve vectores np.float32: se convierten a lista solo al serializar el upsert.
+    """
+
+    def __init__(
+        self,
+        model: str = "embeddinggemma:300m",
+        base_url: str = "http://localhost:11434",
+        cache: Optional[EmbeddingCache] = None,
+    ):
         self.model = model
         self.base_url = base_url.rstrip("/")
-        self.http = httpx.Client(timeout=120)
-
-    def embed(self, text: str) -> List[float]:
-        r = self.http.post(f"{self.base_url}/api/embeddings", json={"model": self.model, "prompt": text})
+        self.http = httpx.Client(http2=True, timeout=OLLAMA_TIMEOUT, limits=OLLAMA_LIMITS)
+        # Cache en disco por (modelo, texto): re-ingestar un PDF sin cambios no llama a Ollama
+        self.cache = cache
+
+    def close(self) -> None:
+        self.http.close()
+
+    def _lookup(self, texts: List[str]) -> Tuple[List[Optional[np.ndarray]], List[int]]:
+        """Vectores cacheados (None si falta) + índices que hay que embeber."""
+        if self.cache is None:
+            return [None] * len(texts), list(range(len(texts)))
+        found = self.cache.get_many(self.model, texts)
+        return found, [i for i, v in enumerate(found) if v is None]
+
+    def _store(
+        self, out: List[Optional[np.ndarray]], texts: List[str], misses: List[int], vecs: List[np.ndarray]
+    ) -> List[np.ndarray]:
+        for i, vec in zip(misses, vecs):
+            out[i] = vec
+        if self.cache is not None and misses:
+            self.cache.put_many(self.model, [texts[i] for i in misses], vecs)
+        return out  # type: ignore[return-value]
+
+    def dim(self) -> int:
+        """
+        Dimensión del modelo: la de la tabla de modelos conocidos, la cacheada si existe;
+        si no, un embed de prueba (que queda cacheado).
+        """
+        known = known_model_dim(self.model)
+        if known:
+            return known
+        if self.cache is not None:
+            cached = self.cache.get_dim(self.model)
+            if cached:
+                return cached
+        dim = len(self.embed("dim_probe"))
+        if self.cache is not None:
+            self.cache.put_dim(self.model, dim)
+        return dim
+
+    def embed(self, text: str) -> np.ndarray:
+        out, misses = self._lookup([text])
+        if not misses:
+            return out[0]  # type: ignore[return-value]
+        # mismo endpoint que los lotes (/api/embed, vectores normalizados): un texto
+        # embebido solo o en lote da el mismo vector bajo la misma clave de cache
+        r = self.http.post(f"{self.base_url}/api/embed", json={"model": self.model, "input": [text]})
+        r.raise_for_status()
+        return self._store(out, [text], misses, self._parse_embed(r.json(), 1))[0]
+
+    @staticmethod
+    def _parse_embed(data: Dict[str, Any], expected: int) -> List[np.ndarray]:
+        vecs = data.get("embeddings")
+        if not vecs or len(vecs) != expected:
+            raise RuntimeError(f"Ollama embed sin 'embeddings' (esperaba {expected}): {data}")
+        # una sola conversión C para todo el lote; nada de listas de floats Python
+        return list(np.asarray(vecs, dtype=np.float32))
+
+    async def _aembed_batch(self, client: httpx.AsyncClient, texts: List[str]) -> List[np.ndarray]:
+        r = await client.post(f"{self.base_url}/api/embed", json={"model": self.model, "input": texts})
         r.raise_for_status()
-        data = r.json()
-        vec = data.get("embedding")
-        if not vec:
-            raise RuntimeError(f"Ollama embeddings sin 'embedding': {data}")
-        return [float(x) for x in vec]
+        return self._parse_embed(r.json(), len(texts))
+
+    async def aembed_many(
+        self,
+        texts: List[str],
+        batch_size: int = 16,
+        concurrency: int = 8,
+        client: Optional[httpx.AsyncClient] = None,
+    ) -> List[np.ndarray]:
+        """
+        Ordena por longitud (lotes homogéneos = menos padding en el modelo), parte en
+        lotes de batch_size y lanza hasta `concurrency` POSTs en paralelo.
+        Devuelve los vectores en el orden original de `texts`; los que ya están en
+        cache no se envían. Si no se pasa `client`, abre uno temporal.
+        """
+        if client is None:
+            async with self.async_client() as tmp:
+                return await self.aembed_many(texts, batch_size, concurrency, client=tmp)
+
+        out, misses = self._lookup(texts)
+        if not misses:
+            return out  # type: ignore[return-value]
+        todo = [texts[i] for i in misses]
+
+        order = sorted(range(len(todo)), key=lambda i: len(todo[i]))
+        batches = [order[i : i + batch_size] for i in range(0, len(order), batch_size)]
+        sem = asyncio.Semaphore(concurrency)
+        fresh: List[np.ndarray] = [np.empty(0, dtype=np.float32)] * len(todo)
+
+        async def run(idxs: List[int]) -> None:
+            async with sem:
+                vecs = await self._aembed_batch(client, [todo[i] for i in idxs])
+            for i, vec in zip(idxs, vecs):
+                fresh[i] = vec
+
+        await asyncio.gather(*(run(b) for b in batches))
+        return self._store(out, texts, misses, fresh)
+
+    @staticmethod
+    def async_client() -> httpx.AsyncClient:
+        return httpx.AsyncClient(http2=True, timeout=OLLAMA_TIMEOUT, limits=OLLAMA_LIMITS)
 
 
 # ---------------------------
@@ -70,10 +202,17 @@ class OllamaEmbeddings:
 # ---------------------------
 
 
+# Por debajo de esto el arranque de procesos cuesta más que la extracción
+PAGES_PER_WORKER_MIN = 8
+
+_RE_SPACES = re.compile(r"[ \t]+")
+_RE_NEWLINES = re.compile(r"\n{3,}")
+
+
 def normalize_ws(s: str) -> str:
     s = s.replace("\u00a0", " ")
-    s = re.sub(r"[ \t]+", " ", s)
-    s = re.sub(r"\n{3,}", "\n\n", s)
+    s = _RE_SPACES.sub(" ", s)
+    s = _RE_NEWLINES.sub("\n\n", s)
     return s.strip()
 
 
@@ -89,24 +228,309 @@ def chunk_text(text: str, chunk_chars: int = 1200, overlap: int = 150) -> List[s
     n = len(text)
     while i < n:
         j = min(i + chunk_chars, n)
-        chunk = text[i:j].strip()
-        if chunk:
-            chunks.append(chunk)
+        # Recorta espacios por índice sobre el texto original: solo se copia el chunk final
+        a, b = i, j
+        while a < b and text[a].isspace():
+            a += 1
+        while b > a and text[b - 1].isspace():
+            b -= 1
+        if a < b:
+            chunks.append(text[a:b])
         if j == n:
             break
         i = max(0, j - overlap)
     return chunks
 
 
-def read_pdf_pages(pdf_path: str) -> List[Dict[str, Any]]:
+def page_text(page: "fitz.Page") -> str:
+    """
+    Texto de la página desde los bloques de MuPDF en orden de lectura (y0, x0).
+    Cada bloque es un párrafo: se unen con línea en blanco para que el chunking los respete.
+    """
+    # (x0, y0, x1, y1, text, block_no, block_type); block_type 1 = imagen
+    blocks = [b for b in page.get_text("blocks") if b[6] == 0]
+    blocks.sort(key=lambda b: (b[1], b[0]))
+    return "\n\n".join(b[4].strip() for b in blocks)
+
+
+def _extract_range(pdf_path: str, start: int, end: int) -> List[Dict[str, Any]]:
+    """
+    Worker: abre su propio documento (MuPDF no es fork-safe) y extrae [start, end).
+    """
     doc = fitz.open(pdf_path)
-    pages = []
-    for idx in range(len(doc)):
-        page = doc[idx]
-        txt = page.get_text("text")
-        pages.append({"page": idx + 1, "text": txt})
-    doc.close()
-    return pages
+    try:
+        return [{"page": idx + 1, "text": page_text(doc[idx])} for idx in range(start, end)]
+    finally:
+        doc.close()
+
+
+def _resolve_workers(total_pages: int, num_workers: Optional[int]) -> int:
+    if num_workers is None:
+        num_workers = min(os.cpu_count() or 1, 4)
+    return max(1, min(num_workers, total_pages // PAGES_PER_WORKER_MIN))
+
+
+# ---------------------------
+#  Pipeline Load -> Chunk -> Embed -> Upsert
+# ---------------------------
+#
+# Cada etapa es una corrutina unida a la siguiente por una asyncio.Queue acotada
+# (backpressure): mientras Ollama embebe un lote, la VDB recibe el anterior y los
+# workers siguen extrayendo páginas. `None` marca fin de stream.
+
+
+@dataclass
+class IngestConfig:
+    pdf_path: str
+    collection: str
+    embed_batch_size: int = 16
+    embed_concurrency: int = 8
+    # ~16KB de JSON por vector de 768 dims: 32 items caben holgados en MAX_BODY_BYTES (1MB) del server
+    upsert_batch_size: int = 32
+    # Decimales de los vectores en el JSON del upsert (None = sin redondeo); 6 ≈ la mitad de bytes
+    wire_decimals: Optional[int] = 6
+    num_workers: Optional[int] = None
+
+
+@dataclass
+class IngestStats:
+    chunks: int = 0
+    upserted: int = 0
+    skipped: int = 0
+    # (id, hash) de todos los chunks del PDF actual, en orden: el manifest nuevo
+    manifest: List[Dict[str, str]] = field(default_factory=list)
+
+
+async def load_stage(cfg: IngestConfig, out_q: "asyncio.Queue[Optional[Dict[str, Any]]]") -> None:
+    with fitz.open(cfg.pdf_path) as doc:
+        total = len(doc)
+    num_workers = _resolve_workers(total, cfg.num_workers)
+    ranges = [(s, min(s + PAGES_PER_WORKER_MIN, total)) for s in range(0, total, PAGES_PER_WORKER_MIN)]
+    if num_workers == 1:
+        # PDF chico: sin pool de procesos (su arranque cuesta más que la extracción);
+        # cada rango va a un thread para no bloquear el event loop
+        for start, end in ranges:
+            for page in await asyncio.to_thread(_extract_range, cfg.pdf_path, start, end):
+                await out_q.put(page)
+        await out_q.put(None)
+        return
+
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=num_workers) as pool:
+        # ventana de rangos en vuelo: los workers no se adelantan sin límite al consumidor
+        in_flight: Deque[asyncio.Future] = deque()
+        for start, end in ranges:
+            in_flight.append(loop.run_in_executor(pool, _extract_range, cfg.pdf_path, start, end))
+            if len(in_flight) >= 2 * num_workers:
+                for page in await in_flight.popleft():
+                    await out_q.put(page)
+        while in_flight:
+            for page in await in_flight.popleft():
+                await out_q.put(page)
+    await out_q.put(None)
+
+
+async def chunk_stage(
+    cfg: IngestConfig,
+    in_q: "asyncio.Queue[Optional[Dict[str, Any]]]",
+    out_q: "asyncio.Queue[Optional[Tuple[str, Dict[str, Any], str]]]",
+    stats: IngestStats,
+    known: Dict[str, str],
+) -> None:
+    while (page := await in_q.get()) is not None:
+        for j, text in enumerate(chunk_text(page["text"], chunk_chars=1200, overlap=150)):
+            stats.chunks += 1
+            i = stats.chunks
+            h = chunk_hash(text)
+            # id determinista y local a la página: editar una página no desplaza los ids de las demás
+            chunk_id = f"chunk_p{page['page']:05d}_{j:03d}_{h[:8]}"
+            stats.manifest.append({"id": chunk_id, "hash": h})
+            if known.get(chunk_id) == h:
+                stats.skipped += 1
+                continue
+            meta = {
+                "source": "pdf",
+                "pdf_path": cfg.pdf_path,
+                "page": page["page"],
+                "chunk_index": i,
+                "text": text,
+            }
+            await out_q.put((chunk_id, meta, text))
+    await out_q.put(None)
+
+
+async def embed_stage(
+    cfg: IngestConfig,
+    embedder: OllamaEmbeddings,
+    in_q: "asyncio.Queue[Optional[Tuple[str, Dict[str, Any], str]]]",
+    out_q: "asyncio.Queue[Optional[Dict[str, Any]]]",
+) -> None:
+    window = cfg.embed_batch_size * cfg.embed_concurrency
+    pending: List[Tuple[str, Dict[str, Any], str]] = []
+
+    async with embedder.async_client() as client:
+
+        async def flush() -> None:
+            if not pending:
+                return
+            vecs = await embedder.aembed_many(
+                [text for _, _, text in pending],
+                batch_size=cfg.embed_batch_size,
+                concurrency=cfg.embed_concurrency,
+                client=client,
+            )
+            for (chunk_id, meta, _), vec in zip(pending, vecs):
+                await out_q.put({"id": chunk_id, "vector": vec, "meta": meta})
+            pending.clear()
+
+        while (item := await in_q.get()) is not None:
+            pending.append(item)
+            if len(pending) >= window:
+                await flush()
+        await flush()
+    await out_q.put(None)
+
+
+async def upsert_stage(
+    cfg: IngestConfig,
+    vdb: RustKissVDBClient,
+    in_q: "asyncio.Queue[Optional[Dict[str, Any]]]",
+    stats: IngestStats,
+) -> None:
+    batch: List[Dict[str, Any]] = []
+
+    async def flush() -> None:
+        if not batch:
+            return
+        # el cliente del SDK es síncrono: a un thread para no frenar las otras etapas
+        await asyncio.to_thread(vdb.vector_upsert_batch, cfg.collection, list(batch), cfg.wire_decimals)
+        prev = stats.upserted
+        stats.upserted += len(batch)
+        batch.clear()
+        if stats.upserted // 20 > prev // 20:
+            print(f"Ingestados {stats.upserted}...")
+
+    while (item := await in_q.get()) is not None:
+        batch.append(item)
+        if len(batch) >= cfg.upsert_batch_size:
+            await flush()
+    await flush()
+
+
+async def ingest_pdf(
+    cfg: IngestConfig,
+    vdb: RustKissVDBClient,
+    embedder: OllamaEmbeddings,
+    known: Optional[Dict[str, str]] = None,
+) -> IngestStats:
+    """
+    Ingesta incremental: `known` es {chunk_id: hash} del manifest anterior; los chunks
+    con el mismo id y hash ya están en la colección y no se embeben ni se suben.
+    """
+    stats = IngestStats()
+    pages_q: asyncio.Queue = asyncio.Queue(maxsize=16)
+    chunks_q: asyncio.Queue = asyncio.Queue(maxsize=2 * cfg.embed_batch_size * cfg.embed_concurrency)
+    vectors_q: asyncio.Queue = asyncio.Queue(maxsize=2 * cfg.upsert_batch_size)
+    await asyncio.gather(
+        load_stage(cfg, pages_q),
+        chunk_stage(cfg, pages_q, chunks_q, stats, known or {}),
+        embed_stage(cfg, embedder, chunks_q, vectors_q),
+        upsert_stage(cfg, vdb, vectors_q, stats),
+    )
+    return stats
+
+
+# ---------------------------
+#  Manifest (ingesta incremental)
+# ---------------------------
+#
+# docs:{collection}:manifest          -> {pdf_path, collection, embed_model, chunks, parts}
+# docs:{collection}:manifest:{p:04d}  -> {"chunks": [{"id", "hash"}, ...]}
+#
+# Los pares (id, hash) van en partes: ~60 bytes por chunk no caben en un solo valor
+# de state (MAX_JSON_BYTES = 64KB) para PDFs grandes.
+
+MANIFEST_PART_SIZE = 500
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def load_manifest(
+    vdb: RustKissVDBClient, collection: str, embed_model: str
+) -> Tuple[Dict[str, str], Set[str], int]:
+    """
+    Devuelve (known, old_ids, nº de partes) del manifest guardado:
+    - known: {chunk_id: hash} que se pueden saltar; vacío si cambió el modelo o falta alguna parte.
+    - old_ids: ids de la ingesta anterior, siempre, para borrar los que ya no existan.
+    """
+    key = f"docs:{collection}:manifest"
+    head = vdb.state_get(key)
+    if not isinstance(head, dict) or not isinstance(head.get("parts"), int):
+        # sin manifest o con el formato antiguo (ver legacy_manifest): todo se considera nuevo
+        return {}, set(), 0
+    entries: Dict[str, str] = {}
+    complete = True
+    for p in range(head["parts"]):
+        part = vdb.state_get(f"{key}:{p:04d}")
+        if not isinstance(part, dict):
+            complete = False
+            continue
+        entries.update((c["id"], c["hash"]) for c in part.get("chunks", []))
+    # otro modelo: los vectores guardados no sirven aunque el texto no cambie;
+    # manifest incompleto: mejor re-ingestar que saltar chunks por error
+    reusable = complete and head.get("embed_model") == embed_model
+    return (entries if reusable else {}), set(entries), head["parts"]
+
+
+def legacy_manifest(vdb: RustKissVDBClient, collection: str) -> Optional[Dict[str, Any]]:
+    """
+    Cabecera del manifest del formato antiguo (sin `parts` ni ids), o None.
+    Esa ingesta usaba ids aleatorios (chunk_{i:05d}_{uuid}) que no coinciden con los
+    deterministas de ahora: re-ingestar sin borrarlos duplicaría cada chunk.
+    """
+    head = vdb.state_get(f"docs:{collection}:manifest")
+    if isinstance(head, dict) and not isinstance(head.get("parts"), int):
+        return head
+    return None
+
+
+def purge_pdf_vectors(vdb: RustKissVDBClient, collection: str, pdf_path: str, dim: int, k: int = 256) -> int:
+    """
+    Borra todos los vectores de `pdf_path` en la colección. El API no lista ids ni
+    borra colecciones, así que se buscan por filtro de meta (k = MAX_K del server por
+    defecto) y se borran hasta que la búsqueda no devuelve nada.
+    """
+    probe = np.ones(dim, dtype=np.float32)  # cualquier vector no nulo: solo importa el filtro
+    removed = 0
+    seen: Set[str] = set()
+    while True:
+        ids = [i for i in vdb.vector_search_ids(collection, probe, k, {"pdf_path": pdf_path}) if i not in seen]
+        if not ids:
+            return removed
+        vdb.vector_delete_batch(collection, ids)
+        seen.update(ids)
+        removed += len(ids)
+
+
+def save_manifest(
+    vdb: RustKissVDBClient,
+    collection: str,
+    head: Dict[str, Any],
+    chunks: List[Dict[str, str]],
+    old_parts: int = 0,
+) -> str:
+    key = f"docs:{collection}:manifest"
+    parts = [chunks[i : i + MANIFEST_PART_SIZE] for i in range(0, len(chunks), MANIFEST_PART_SIZE)]
+    ops = [{"key": f"{key}:{p:04d}", "value": {"chunks": part}} for p, part in enumerate(parts)]
+    for i in range(0, len(ops), 16):
+        vdb.state_batch_put(ops[i : i + 16])
+    # la cabecera va al final: si algo falla antes, la próxima corrida no confía en partes a medias
+    vdb.state_put(key, {**head, "chunks": len(chunks), "parts": len(parts)})
+    for p in range(len(parts), old_parts):
+        vdb.state_delete(f"{key}:{p:04d}")
+    return key
 
 
 def main():
@@ -117,59 +541,73 @@ def main():
     COLLECTION = os.getenv("VDB_COLLECTION", "docs_portugues_exam").replace("-", "_")
     METRIC = os.getenv("VDB_METRIC", "cosine")
     EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "embeddinggemma:300m")
+    cfg = IngestConfig(
+        pdf_path=PDF_PATH,
+        collection=COLLECTION,
+        embed_batch_size=max(1, int(os.getenv("EMBED_BATCH_SIZE", "16"))),
+        embed_concurrency=max(1, int(os.getenv("EMBED_CONCURRENCY", "8"))),
+        upsert_batch_size=max(1, int(os.getenv("UPSERT_BATCH_SIZE", "32"))),
+        wire_decimals=int(os.getenv("VECTOR_WIRE_DECIMALS", "6")) or None,  # 0 = sin redondeo
+        num_workers=int(os.getenv("PDF_WORKERS", "0")) or None,
+    )
+    # ignora el manifest y re-sube todo; con un manifest del formato antiguo además borra sus vectores
+    force = os.getenv("FORCE_REINGEST", "0") == "1"
 
     vdb = RustKissVDBClient()
     vdb.health()
 
-    embedder = OllamaEmbeddings(model=EMBED_MODEL)
-
-    pages = read_pdf_pages(PDF_PATH)
-
-    # Unimos páginas y chunkamos manteniendo page_range aproximado
-    all_chunks = []
-    for p in pages:
-        p_chunks = chunk_text(p["text"], chunk_chars=1200, overlap=150)
-        for c in p_chunks:
-            all_chunks.append({"page": p["page"], "text": c})
-
-    if not all_chunks:
-        raise SystemExit("No se extrajo texto del PDF (¿es escaneado sin texto?).")
-
-    # Detectar dim real con un embed de prueba
-    dim = len(embedder.embed("dim_probe"))
-    vdb.vector_create(COLLECTION, dim=dim, metric=METRIC)
-
-    # Guardar “manifest” en state (opcional, útil para inspección)
-    manifest_key = f"docs:{COLLECTION}:manifest"
-    vdb.state_put(
-        manifest_key,
-        {
-            "pdf_path": PDF_PATH,
-            "collection": COLLECTION,
-            "embed_model": EMBED_MODEL,
-            "chunks": len(all_chunks),
-        },
-    )
+    cache_path = os.getenv("EMBED_CACHE_PATH", ".embed_cache.sqlite")  # "" desactiva el cache
+    cache = EmbeddingCache(cache_path) if cache_path else None
+    embedder = OllamaEmbeddings(model=EMBED_MODEL, cache=cache)
+
+    try:
+        # Dim del modelo: OLLAMA_EMBED_DIM > modelos conocidos > cache > embed de prueba (la colección debe existir antes del pipeline)
+        dim = int(os.getenv("OLLAMA_EMBED_DIM", "0")) or embedder.dim()
+        vdb.vector_create(COLLECTION, dim=dim, metric=METRIC)
+
+        legacy = legacy_manifest(vdb, COLLECTION)
+        if legacy is not None:
+            legacy_pdf = legacy.get("pdf_path") or PDF_PATH
+            if not force:
+                raise SystemExit(
+                    f"⚠️  '{COLLECTION}' fue ingestada con el formato antiguo (ids aleatorios): "
+                    "re-ingestar duplicaría cada chunk en las búsquedas. Ejecuta con FORCE_REINGEST=1 "
+                    f"para borrar sus vectores de '{legacy_pdf}' y re-ingestar desde cero."
+                )
+            purged = purge_pdf_vectors(vdb, COLLECTION, legacy_pdf, dim)
+            print(f"Formato antiguo: {purged} vectores de '{legacy_pdf}' eliminados.")
+
+        known, old_ids, old_parts = load_manifest(vdb, COLLECTION, EMBED_MODEL)
+        if force:
+            known = {}  # solo desactiva el salto: old_ids sigue sirviendo para borrar
+
+        stats = asyncio.run(ingest_pdf(cfg, vdb, embedder, known))
+        if not stats.chunks:
+            raise SystemExit("No se extrajo texto del PDF (¿es escaneado sin texto?).")
+
+        # chunks que ya no existen en el PDF (páginas editadas o eliminadas)
+        current = {c["id"] for c in stats.manifest}
+        removed = [cid for cid in old_ids if cid not in current]
+        for i in range(0, len(removed), cfg.upsert_batch_size):
+            vdb.vector_delete_batch(COLLECTION, removed[i : i + cfg.upsert_batch_size])
+
+        manifest_key = save_manifest(
+            vdb,
+            COLLECTION,
+            {"pdf_path": PDF_PATH, "collection": COLLECTION, "embed_model": EMBED_MODEL},
+            stats.manifest,
+            old_parts,
+        )
 
-    # Upsert chunks
-    for i, ch in enumerate(all_chunks, start=1):
-        text = ch["text"]
-        vec = embedder.embed(text)
-        chunk_id = f"chunk_{i:05d}_{uuid.uuid4().hex[:8]}"
-        meta = {
-            "source": "pdf",
-            "pdf_path": PDF_PATH,
-            "page": ch["page"],
-            "chunk_index": i,
-            "text": text,
-        }
-        vdb.vector_upsert(COLLECTION, chunk_id, vec, meta=meta)
-
-        if i % 20 == 0:
-            print(f"Ingestados {i}/{len(all_chunks)}...")
-
-    print(f"✅ Listo. Collection='{COLLECTION}' chunks={len(all_chunks)} dim={dim}")
-    print(f"Manifest en state: {manifest_key}")
+        print(
+            f"✅ Listo. Collection='{COLLECTION}' chunks={stats.chunks} dim={dim} "
+            f"nuevos={stats.upserted} sin_cambios={stats.skipped} eliminados={len(removed)}"
+        )
+        print(f"Manifest en state: {manifest_key}")
+    finally:
+        embedder.close()
+        if cache is not None:
+            cache.close()
 
 
 if __name__ == "__main__":
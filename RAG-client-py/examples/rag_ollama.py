@@ -70,7 +70,7 @@ def main():
 
     console.print("\n[dim]Sources used:[/dim]")
     for src in response.sources:
-        console.print(f"- {src.meta.get('text_snippet')} (Score: {src.score:.4f})")
+        console.print(f"- {(src.content or '')[:200]}... (Score: {src.score:.4f})")
 
 
 if __name__ == "__main__":
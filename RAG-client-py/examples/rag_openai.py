@@ -1,6 +1,7 @@
 import os
 from rustkissvdb import Client
 from rich.console import Console
+from rich.live import Live
 from rich.markdown import Markdown
 
 # Pretty printing
@@ -51,18 +52,21 @@ def main():
     question = "What makes RustKissVDB different from Milvus?"
     console.print(f"\n[bold purple]Question:[/bold purple] {question}")
     
-    response = client.rag.chat(
-        collection=COLLECTION,
-        query=question,
-        k=3
-    )
-    
     console.print("\n[bold purple]Answer:[/bold purple]")
-    console.print(Markdown(response.answer))
+    answer = ""
+    response = None
+    # Tokens are rendered as they arrive; the last item carries sources and usage
+    with Live(Markdown(answer), console=console, refresh_per_second=8) as live:
+        for delta, final in client.rag.chat_stream(collection=COLLECTION, query=question, k=3):
+            if final is not None:
+                response = final
+            elif delta:
+                answer += delta
+                live.update(Markdown(answer))
     
     console.print("\n[dim]Sources used:[/dim]")
     for src in response.sources:
-        console.print(f"- {src.meta.get('text_snippet')} (Score: {src.score:.4f})")
+        console.print(f"- {(src.content or '')[:200]}... (Score: {src.score:.4f})")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
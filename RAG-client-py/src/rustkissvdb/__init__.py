@@ -1,6 +1,7 @@
-from .client import Client
+from .client import AsyncClient, Client
 from .config import Config
+from .embed_cache import EmbeddingCache
 from .errors import RustKissVDBError
 
-__all__ = ["Client", "Config", "RustKissVDBError"]
+__all__ = ["AsyncClient", "Client", "Config", "EmbeddingCache", "RustKissVDBError"]
 __version__ = "0.1.0"
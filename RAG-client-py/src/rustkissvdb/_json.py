@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from typing import Any
+
+import msgspec
+import numpy as np
+
+
+def _enc_hook(obj: Any) -> Any:
+    # arrays/escalares numpy que lleguen en el payload (vectores, scores, ids)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise NotImplementedError(f"Objeto no serializable a JSON: {type(obj)!r}")
+
+
+# Los bodies se serializan con msgspec (floats en C) en vez del json de la stdlib
+# que usa httpx con `json=`; un upsert_batch son cientos de listas de floats.
+# Compartido por client (bodies) y vector (lotes medidos en bytes).
+json_encoder = msgspec.json.Encoder(enc_hook=_enc_hook)
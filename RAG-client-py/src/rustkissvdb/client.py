@@ -1,17 +1,20 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, Optional
+from typing import Any, ContextManager, Dict, Optional, Tuple
 
 import httpx
+import msgspec
 
+from ._json import json_encoder
 from .doc import DocAPI
+from .embed_cache import EmbeddingCache
 from .errors import RustKissVDBError
 from .rag import RAGClient
 from .sql import SqlAPI
 from .state import StateAPI
 from .stream import StreamAPI
-from .vector import VectorAPI
+from .vector import AsyncVectorAPI, VectorAPI
 
 try:
     from dotenv import load_dotenv
@@ -21,6 +24,19 @@ except ImportError:
     pass
 
 
+# HTTP/2 multiplexa ráfagas de upsert/search sobre pocas conexiones keep-alive;
+# el pool holgado cubre a quien use el cliente desde varios threads.
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=30.0)
+
+_JSON_HEADERS = {"content-type": "application/json"}
+
+
+def _encode_body(payload: Optional[Dict[str, Any]]) -> Tuple[Optional[bytes], Optional[Dict[str, str]]]:
+    if payload is None:
+        return None, None
+    return json_encoder.encode(payload), _JSON_HEADERS
+
+
 class Client:
     """
     Cliente principal para RustKissVDB.
@@ -31,6 +47,8 @@ class Client:
         base_url: URL del servidor RustKissVDB (ej. http://localhost:9917).
         api_key: Clave de API para RustKissVDB.
         openai_key: (Opcional) Clave de API de OpenAI para RAG. Si no se da, busca en env vars.
+        embed_cache_path: (Opcional) Ruta del cache SQLite de embeddings del RAG. Por defecto
+            EMBED_CACHE_PATH; sin ruta no hay cache.
     """
 
     def __init__(
@@ -39,6 +57,7 @@ class Client:
         api_key: Optional[str] = None,
         openai_key: Optional[str] = None,
         timeout: float = 60.0,
+        embed_cache_path: Optional[str] = None,
     ) -> None:
         # Load defaults from environment if not provided
         self._base_url = (base_url or os.getenv("KISS_VDB_URL", "http://localhost:9917")).rstrip("/")
@@ -52,6 +71,8 @@ class Client:
             base_url=self._base_url,
             timeout=timeout,
             headers=headers,
+            http2=True,
+            limits=HTTP_LIMITS,
         )
 
         # APIs de Base de Datos (Low Level)
@@ -64,12 +85,17 @@ class Client:
         # API RAG (High Level)
         # Se inicializa de forma perezosa o directa.
         # Pasamos el vector_api para que el RAG client pueda hacer upserts/search.
-        self.rag = RAGClient(vector_api=self.vector)
+        cache_path = embed_cache_path or os.getenv("EMBED_CACHE_PATH")
+        self._embed_cache = EmbeddingCache(cache_path) if cache_path else None
+        self.rag = RAGClient(vector_api=self.vector, embedding_cache=self._embed_cache)
         if openai_key:
             self.rag.openai.api_key = openai_key
 
     def close(self) -> None:
         self._http.close()
+        self.rag.close()
+        if self._embed_cache is not None:
+            self._embed_cache.close()
 
     def __enter__(self) -> "Client":
         return self
@@ -84,18 +110,36 @@ class Client:
         *,
         params: Optional[Dict[str, Any]] = None,
         json: Optional[Dict[str, Any]] = None,
+        decoder: Optional[msgspec.json.Decoder] = None,
     ) -> Any:
+        """`decoder`: decodifica el body directamente a su tipo (p. ej. SearchResponse) en vez de a dict."""
+        content, headers = _encode_body(json)
         try:
-            resp = self._http.request(method, path, params=params, json=json)
+            resp = self._http.request(method, path, params=params, content=content, headers=headers)
         except httpx.RequestError as e:
             raise RustKissVDBError(f"Connection error: {e}")
-
+        return self._parse_response(resp, decoder)
+
+    @classmethod
+    def _parse_response(cls, resp: httpx.Response, decoder: Optional[msgspec.json.Decoder] = None) -> Any:
+        # El body se lee una sola vez y se parsea una sola vez: el mismo `data`
+        # sirve para el retorno y para el mensaje de error.
+        body = resp.content
+        is_json = resp.headers.get("content-type", "").startswith("application/json")
         if resp.status_code >= 400:
-            raise RustKissVDBError(self._error_message(resp))
-
-        ctype = resp.headers.get("content-type", "")
-        if ctype.startswith("application/json"):
-            return resp.json()
+            data = None
+            if is_json:
+                try:
+                    data = msgspec.json.decode(body)
+                except msgspec.DecodeError:
+                    pass
+            raise RustKissVDBError(cls._error_message(data, body))
+        if resp.status_code == 204 or not body:
+            return None
+        if decoder is not None:
+            return decoder.decode(body)
+        if is_json:
+            return msgspec.json.decode(body)
         return resp.text
 
     def stream_request(
@@ -104,16 +148,88 @@ class Client:
         path: str,
         *,
         params: Optional[Dict[str, Any]] = None,
-    ) -> httpx.Response:
-        req = self._http.build_request(method, path, params=params)
-        return self._http.send(req, stream=True)
+    ) -> ContextManager[httpx.Response]:
+        """
+        Respuesta en streaming; usar como `with client.stream_request(...) as resp:`
+        (cierra la conexión al salir). Para SSE: `rustkissvdb.stream.iter_sse(resp)`.
+        """
+        return self._http.stream(method, path, params=params)
 
     @staticmethod
-    def _error_message(resp: httpx.Response) -> str:
-        try:
-            data = resp.json()
+    def _error_message(data: Any, body: bytes) -> str:
+        """`data`: body ya parseado (o None si no era JSON); `body`: bytes crudos."""
+        text = body.decode("utf-8", errors="replace")
+        if isinstance(data, dict):
             err = data.get("error") or "error"
-            msg = data.get("message") or resp.text
+            msg = data.get("message") or text
             return f"{err} - {msg}"
-        except Exception:
-            return resp.text
+        return text
+
+
+class AsyncClient:
+    """
+    Cliente async (httpx.AsyncClient) para RustKissVDB.
+
+    Expone `request` async, lecturas vectoriales async (`vector.info`, `vector.search`)
+    y `rag.achat`. Crear uno por event loop y reutilizarlo: el pool HTTP/2 queda
+    abierto entre llamadas. Cerrar con `await aclose()` o `async with`.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        openai_key: Optional[str] = None,
+        timeout: float = 60.0,
+        embed_cache_path: Optional[str] = None,
+    ) -> None:
+        self._base_url = (base_url or os.getenv("KISS_VDB_URL", "http://localhost:9917")).rstrip("/")
+        self._api_key = api_key or os.getenv("KISS_VDB_KEY", "dev")
+
+        headers: Dict[str, str] = {}
+        if self._api_key:
+            headers["Authorization"] = f"Bearer {self._api_key}"
+
+        self._http = httpx.AsyncClient(
+            base_url=self._base_url,
+            timeout=timeout,
+            headers=headers,
+            http2=True,
+            limits=HTTP_LIMITS,
+        )
+
+        self.vector = AsyncVectorAPI(self)
+
+        cache_path = embed_cache_path or os.getenv("EMBED_CACHE_PATH")
+        self._embed_cache = EmbeddingCache(cache_path) if cache_path else None
+        self.rag = RAGClient(vector_api=None, embedding_cache=self._embed_cache, async_vector_api=self.vector)
+        if openai_key:
+            self.rag.openai.api_key = openai_key
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+        await self.rag.aclose()
+        if self._embed_cache is not None:
+            self._embed_cache.close()
+
+    async def __aenter__(self) -> "AsyncClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Dict[str, Any]] = None,
+        decoder: Optional[msgspec.json.Decoder] = None,
+    ) -> Any:
+        content, headers = _encode_body(json)
+        try:
+            resp = await self._http.request(method, path, params=params, content=content, headers=headers)
+        except httpx.RequestError as e:
+            raise RustKissVDBError(f"Connection error: {e}")
+        return Client._parse_response(resp, decoder)
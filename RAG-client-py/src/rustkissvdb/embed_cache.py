@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# Límite conservador de parámetros por sentencia en SQLite
+_SQL_CHUNK = 500
+
+
+class EmbeddingCache:
+    """
+    Cache persistente de embeddings en SQLite.
+
+    La clave es blake2b(model + "|" + text) (16 bytes) y el valor el vector en
+    float32 crudo. Los embeddings son deterministas por (modelo, texto), así que
+    un hit evita la llamada de red al proveedor.
+
+    También guarda la dimensión de cada modelo para saltarse el "dim probe".
+    """
+
+    def __init__(self, path: str = ".embed_cache.sqlite") -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vec BLOB NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS model_dims (model TEXT PRIMARY KEY, dim INTEGER NOT NULL)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(model: str, text: str) -> bytes:
+        return hashlib.blake2b(f"{model}|{text}".encode("utf-8"), digest_size=16).digest()
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Devuelve un vector float32 por texto, o None si no está en cache."""
+        keys = [self.key(model, t) for t in texts]
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), _SQL_CHUNK):
+                part = keys[i : i + _SQL_CHUNK]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(f"SELECT key, vec FROM embeddings WHERE key IN ({marks})", part)
+                found.update(rows.fetchall())
+        out: List[Optional[np.ndarray]] = []
+        for k in keys:
+            blob = found.get(k)
+            out.append(np.frombuffer(blob, dtype=np.float32) if blob is not None else None)
+        return out
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        rows = [
+            (self.key(model, t), np.asarray(v, dtype=np.float32).tobytes())
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR IGNORE INTO embeddings (key, vec) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        return self.get_many(model, [text])[0]
+
+    def put(self, model: str, text: str, vector: Sequence[float]) -> None:
+        self.put_many(model, [text], [vector])
+
+    def get_dim(self, model: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute("SELECT dim FROM model_dims WHERE model = ?", (model,)).fetchone()
+        return int(row[0]) if row else None
+
+    def put_dim(self, model: str, dim: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO model_dims (model, dim) VALUES (?, ?)",
+                (model, int(dim)),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "EmbeddingCache":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
@@ -1,10 +1,170 @@
+import asyncio
+import hashlib
+import io
+import json
 import os
-from typing import Any, Dict, List, Optional, Union
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
-from openai import OpenAI
+import httpx
+import msgspec
+import numpy as np
+from openai import AsyncOpenAI, OpenAI
 
+from .embed_cache import EmbeddingCache
 from .types import RAGGeneration, SearchResult
 
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Micro-batching for embeddings: approx. tokens (len // 4) per request,
+# provider cap on inputs per request and concurrent requests in flight.
+EMBED_BATCH_TOKENS = 8000
+EMBED_BATCH_MAX_INPUTS = 2048
+EMBED_CONCURRENCY = 16
+
+# Pool for the OpenAI-compatible API: HTTP/2 keep-alive connections reused
+# across embedding batches and chat calls (no handshake per request).
+OPENAI_HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=30.0)
+OPENAI_TIMEOUT = httpx.Timeout(60.0)
+
+# Upper bound on retrieved text pasted into the chat prompt (chars, ~12k tokens).
+MAX_CONTEXT_CHARS = 48000
+
+DEFAULT_SYSTEM_PROMPT = "You are a helpful assistant. Use the provided context to answer the user's question."
+
+# Output dimension of well-known embedding models (no probe request needed).
+# Ollama tags ("embeddinggemma:300m") are also looked up by their base name.
+_KNOWN_DIMS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+    "nomic-embed-text": 768,
+    "embeddinggemma": 768,
+    "mxbai-embed-large": 1024,
+    "all-minilm": 384,
+    "bge-m3": 1024,
+}
+
+
+def known_model_dim(model: str) -> Optional[int]:
+    if model in _KNOWN_DIMS:
+        return _KNOWN_DIMS[model]
+    return _KNOWN_DIMS.get(model.rsplit("/", 1)[-1].split(":", 1)[0])
+
+
+# Line breaks and tabs become spaces before embedding (one C-level pass per text)
+_WS_TABLE = str.maketrans({"\n": " ", "\r": " ", "\t": " "})
+
+# Split boundaries for chunking, from coarsest to finest.
+CHUNK_SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+
+def _fit_prefix(text: str, limit: int, length: Callable[[str], int]) -> int:
+    """Longest prefix (in chars) of `text` whose length is <= limit (at least 1 char)."""
+    if length is len:
+        return max(1, min(len(text), limit))
+    lo, hi = 1, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if length(text[:mid]) <= limit:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _tail_words(text: str, limit: int, length: Callable[[str], int]) -> str:
+    """Longest run of trailing words of `text` whose length is <= limit."""
+    if limit <= 0:
+        return ""
+    if length is len:
+        # char lengths: the answer starts right after the first space in the last `limit` chars
+        if len(text) <= limit:
+            return text
+        i = text.find(" ", len(text) - limit - 1)
+        return text[i + 1 :] if i >= 0 else ""
+    words = text.split(" ")
+    lo, hi = 0, len(words)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if length(" ".join(words[-mid:])) <= limit:
+            lo = mid
+        else:
+            hi = mid - 1
+    return " ".join(words[-lo:]) if lo else ""
+
+
+def _fragments(text: str, chunk_size: int, seps: Sequence[str], length: Callable[[str], int]) -> List[str]:
+    if length(text) <= chunk_size:
+        return [text]
+    for k, sep in enumerate(seps):
+        if sep not in text:
+            continue
+        parts = text.split(sep)
+        # keep the separator on each piece so that joining the fragments restores the text
+        pieces = [p + sep for p in parts[:-1]] + [parts[-1]]
+        out: List[str] = []
+        for piece in pieces:
+            if not piece:
+                continue
+            # most pieces already fit: no recursive call for them
+            if length(piece) <= chunk_size:
+                out.append(piece)
+            else:
+                out.extend(_fragments(piece, chunk_size, seps[k + 1 :], length))
+        return out
+    # no separator left: hard cut
+    out = []
+    while text:
+        n = _fit_prefix(text, chunk_size, length)
+        out.append(text[:n])
+        text = text[n:]
+    return out
+
+
+def _split_recursive(
+    text: str,
+    chunk_size: int,
+    overlap: int = 0,
+    seps: Sequence[str] = CHUNK_SEPARATORS,
+    length: Callable[[str], int] = len,
+) -> List[str]:
+    """
+    Splits text on the coarsest separator that makes pieces fit `chunk_size`
+    (paragraphs, then lines, sentences, words), then greedily merges adjacent
+    pieces up to `chunk_size`. Each chunk starts with the last `overlap` worth of
+    words of the previous one. Sizes are measured with `length` (chars by default).
+    """
+    # With plain char lengths (the default), len(a) + len(b) replaces building a + b
+    # just to measure it; token lengths are not additive and keep the generic path.
+    if length is len:
+
+        def fits(a: str, b: str) -> bool:
+            return len(a) + len(b) <= chunk_size
+
+    else:
+
+        def fits(a: str, b: str) -> bool:
+            return length(a + b) <= chunk_size
+
+    chunks: List[str] = []
+    current = ""
+    for frag in _fragments(text, chunk_size, seps, length):
+        if current and not fits(current, frag):
+            chunks.append(current)
+            body = current.rstrip()
+            tail = _tail_words(body, overlap, length)
+            if tail:
+                tail += current[len(body) :]  # keep the separator before the next piece
+            current = tail if tail and fits(tail, frag) else ""
+        current += frag
+    if current:
+        chunks.append(current)
+    return [c for c in (c.strip() for c in chunks) if c]
+
 
 class RAGClient:
     """
@@ -18,46 +178,230 @@ class RAGClient:
         openai_client: Optional[OpenAI] = None,
         embedding_model: str = "text-embedding-3-small",
         llm_model: str = "gpt-4o",
+        cache_threshold: float = 0.95,
+        cache_size: int = 0,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        async_vector_api=None,  # Type: AsyncVectorAPI, needed by achat()
     ):
         self.vector_api = vector_api
+        self.async_vector_api = async_vector_api
 
-        # Initialize OpenAI client (tries env vars if not provided)
+        # Initialize OpenAI client (tries env vars if not provided); close() only
+        # closes a client built here, not one passed in.
+        self._owns_openai = openai_client is None
         self.openai = openai_client or OpenAI(
             api_key=os.getenv("OPENAI_API_KEY"),
             base_url=os.getenv("OPENAI_BASE_URL"),
+            http_client=httpx.Client(http2=True, limits=OPENAI_HTTP_LIMITS, timeout=OPENAI_TIMEOUT),
         )
         self.embedding_model = embedding_model or os.getenv("EMBEDDING_MODEL")
         self.llm_model = llm_model or os.getenv("LLM_MODEL")
 
-        self._cached_dim: Optional[int] = None
+        self._model_dims: Dict[str, int] = {}
+
+        # Persistent (model, text) -> vector cache shared by ingest_text and chat()
+        self.embedding_cache = embedding_cache
 
-    def embed(self, text: Union[str, List[str]]) -> List[float]:
-        """Generates embeddings for a single text or list of texts."""
+        self.embed_batch_tokens = EMBED_BATCH_TOKENS
+        self.embed_concurrency = EMBED_CONCURRENCY
+        self.max_context_chars = MAX_CONTEXT_CHARS
+        self._aopenai: Optional[AsyncOpenAI] = None
+        self._aopenai_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._collection_dims: Dict[str, int] = {}
+
+        # Query similarity cache for chat(): (settings key, unit query vector, answer).
+        # A query whose cosine similarity to a cached one is >= cache_threshold,
+        # under the same settings, reuses the answer. Opt-in (cache_size=0 disables it):
+        # a near-identical query may differ in a key term, and only ingest_text
+        # invalidates it; call clear_cache() after writing to a collection otherwise.
+        self.cache_threshold = cache_threshold
+        self._qcache: Deque[Tuple[Tuple[Any, ...], np.ndarray, RAGGeneration]] = deque(maxlen=max(0, cache_size))
+
+    @property
+    def cache_size(self) -> int:
+        """Max answers kept by the chat similarity cache (0 = disabled)."""
+        return self._qcache.maxlen or 0
+
+    @cache_size.setter
+    def cache_size(self, size: int) -> None:
+        self._qcache = deque(self._qcache, maxlen=max(0, size))
+
+    def embed(self, text: Union[str, List[str]]) -> np.ndarray:
+        """
+        Generates float32 embeddings for a single text or list of texts.
+        A string returns one vector (dim,); a list always returns a matrix (N, dim).
+        """
         if isinstance(text, str):
-            text = [text]
+            return self.embed_batch([text])[0]
+        return self.embed_batch(text)
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeds texts, always returning a float32 matrix with one row per text in input order.
+        Texts found in `embedding_cache` are not sent; the misses are packed into
+        length-sorted sub-batches of ~`embed_batch_tokens`: a single sub-batch is
+        one sync call, several are sent concurrently.
+        """
+        if not texts:
+            return np.empty((0, self._model_dims.get(self.embedding_model, 0)), dtype=np.float32)
 
         # Clean text
-        text = [t.replace("\n", " ") for t in text]
+        texts = [t.translate(_WS_TABLE) for t in texts]
+
+        if self.embedding_cache is None:
+            return self._embed_uncached(texts)
+
+        vectors, misses = self._cache_get(texts)
+        if misses:
+            miss_texts = [texts[i] for i in misses]
+            self._cache_fill(vectors, misses, miss_texts, self._embed_uncached(miss_texts))
+        return np.stack(vectors)  # type: ignore[arg-type]
+
+    async def aembed_batch(self, texts: List[str]) -> np.ndarray:
+        """Async twin of embed_batch, using this event loop's AsyncOpenAI client."""
+        if not texts:
+            return np.empty((0, self._model_dims.get(self.embedding_model, 0)), dtype=np.float32)
+
+        texts = [t.translate(_WS_TABLE) for t in texts]
+        # sqlite reads/writes are blocking: keep them off the event loop
+        vectors, misses = await asyncio.to_thread(self._cache_get, texts)
+        if misses:
+            miss_texts = [texts[i] for i in misses]
+            fresh = await self._aembed_many(miss_texts, self._pack_batches(miss_texts), await self._loop_aopenai())
+            await asyncio.to_thread(self._cache_fill, vectors, misses, miss_texts, np.asarray(fresh, dtype=np.float32))
+        return np.stack(vectors)  # type: ignore[arg-type]
+
+    def _cache_get(self, texts: List[str]) -> Tuple[List[Optional[np.ndarray]], List[int]]:
+        if self.embedding_cache is None:
+            return [None] * len(texts), list(range(len(texts)))
+        vectors = self.embedding_cache.get_many(self.embedding_model, texts)
+        return vectors, [i for i, v in enumerate(vectors) if v is None]
+
+    def _cache_fill(
+        self,
+        vectors: List[Optional[np.ndarray]],
+        misses: List[int],
+        miss_texts: List[str],
+        fresh: np.ndarray,
+    ) -> None:
+        if self.embedding_cache is not None:
+            self.embedding_cache.put_many(self.embedding_model, miss_texts, fresh)
+        for i, v in zip(misses, fresh):
+            vectors[i] = v
+
+    def _embed_uncached(self, texts: List[str]) -> np.ndarray:
+        batches = self._pack_batches(texts)
+        if len(batches) == 1:
+            response = self.openai.embeddings.create(input=texts, model=self.embedding_model)
+            return np.asarray([item.embedding for item in response.data], dtype=np.float32)
 
-        response = self.openai.embeddings.create(input=text, model=self.embedding_model)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return np.asarray(asyncio.run(self._aembed_many(texts, batches)), dtype=np.float32)
+
+        # Called from inside an event loop: asyncio.run is not allowed, go sequential
+        out: List[Optional[List[float]]] = [None] * len(texts)
+        for idxs in batches:
+            response = self.openai.embeddings.create(input=[texts[i] for i in idxs], model=self.embedding_model)
+            for i, item in zip(idxs, response.data):
+                out[i] = item.embedding
+        return np.asarray(out, dtype=np.float32)
+
+    def _pack_batches(self, texts: List[str]) -> List[List[int]]:
+        """Greedy packing of length-sorted indices into batches under the token budget."""
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches: List[List[int]] = []
+        current: List[int] = []
+        tokens = 0
+        for i in order:
+            t = len(texts[i]) // 4 + 1
+            if current and (tokens + t > self.embed_batch_tokens or len(current) >= EMBED_BATCH_MAX_INPUTS):
+                batches.append(current)
+                current, tokens = [], 0
+            current.append(i)
+            tokens += t
+        if current:
+            batches.append(current)
+        return batches
+
+    def _async_openai(self) -> AsyncOpenAI:
+        # Built per run from the sync client's settings: they may be changed after
+        # __init__, and an async client can't outlive the event loop of asyncio.run.
+        return AsyncOpenAI(
+            api_key=self.openai.api_key,
+            base_url=self.openai.base_url,
+            organization=self.openai.organization,
+            timeout=self.openai.timeout,
+            max_retries=self.openai.max_retries,
+            http_client=httpx.AsyncClient(http2=True, limits=OPENAI_HTTP_LIMITS, timeout=self.openai.timeout),
+        )
 
-        # Return single vector if input was single string
-        if len(text) == 1:
-            return response.data[0].embedding
-        else:
-            return [item.embedding for item in response.data]
+    async def _loop_aopenai(self) -> AsyncOpenAI:
+        """One AsyncOpenAI client per event loop, reused across async calls."""
+        loop = asyncio.get_running_loop()
+        if self._aopenai is not None and self._aopenai_loop is not loop:
+            # a new loop (e.g. another asyncio.run): release the previous pool first
+            old, self._aopenai = self._aopenai, None
+            try:
+                await old.close()
+            except Exception:
+                pass  # its loop is gone along with whatever it could still flush
+        if self._aopenai is None:
+            self._aopenai = self._async_openai()
+            self._aopenai_loop = loop
+        return self._aopenai
+
+    def close(self) -> None:
+        """Closes the OpenAI connection pool (if this client created it)."""
+        if self._owns_openai:
+            self.openai.close()
+
+    async def aclose(self) -> None:
+        if self._aopenai is not None:
+            await self._aopenai.close()
+            self._aopenai = None
+            self._aopenai_loop = None
+        self.close()
+
+    async def _aembed_many(
+        self,
+        texts: List[str],
+        batches: List[List[int]],
+        client: Optional[AsyncOpenAI] = None,
+    ) -> List[List[float]]:
+        if client is None:
+            async with self._async_openai() as owned:
+                return await self._aembed_many(texts, batches, owned)
+
+        sem = asyncio.Semaphore(self.embed_concurrency)
+        out: List[Optional[List[float]]] = [None] * len(texts)
+
+        async def run(idxs: List[int]) -> None:
+            async with sem:
+                response = await client.embeddings.create(input=[texts[i] for i in idxs], model=self.embedding_model)
+            for i, item in zip(idxs, response.data):
+                out[i] = item.embedding
+
+        await asyncio.gather(*(run(b) for b in batches))
+        return out  # type: ignore[return-value]
 
     def get_model_dimension(self) -> int:
         """
-        Determines the output dimension of the configured embedding model
-        by generating a dummy embedding.
+        Determines the output dimension of the configured embedding model:
+        built-in table of well-known models, then the embedding cache, and only
+        then a dummy embedding (whose result is persisted in the cache).
         """
-        if self._cached_dim is not None:
-            return self._cached_dim
-
-        dummy_vector = self.embed("test_dimension_probe")
-        self._cached_dim = len(dummy_vector)
-        return self._cached_dim
+        model = self.embedding_model
+        dim = self._model_dims.get(model) or known_model_dim(model)
+        if dim is None and self.embedding_cache is not None:
+            dim = self.embedding_cache.get_dim(model)
+        if dim is None:
+            dim = int(self.embed("test_dimension_probe").shape[0])
+            if self.embedding_cache is not None:
+                self.embedding_cache.put_dim(model, dim)
+        self._model_dims[model] = dim
+        return dim
 
     def initialize_collection(self, collection: str, metric: str = "cosine") -> int:
         """
@@ -89,48 +433,160 @@ class RAGClient:
             
         return dim
 
+    def _token_length(self) -> Callable[[str], int]:
+        if tiktoken is None:
+            raise ImportError("by_tokens=True requires tiktoken (pip install rustkissvdb[tokens])")
+        try:
+            enc = tiktoken.encoding_for_model(self.embedding_model)
+        except KeyError:
+            enc = tiktoken.get_encoding("cl100k_base")
+        return lambda s: len(enc.encode_ordinary(s))
+
     def ingest_text(
         self, 
         collection: str, 
         text: str, 
         metadata: Dict[str, Any] = {}, 
         chunk_size: int = 1000,
-        id_prefix: str = "doc"
+        id_prefix: str = "doc",
+        chunk_overlap: Optional[int] = None,
+        by_tokens: bool = False,
     ) -> int:
         """
         Chunks text, generates embeddings, and upserts to the database.
+        `chunk_size` and `chunk_overlap` (default 1/8 of chunk_size) are chars,
+        or tokens of the embedding model if `by_tokens` (requires tiktoken).
         Returns the number of chunks ingested.
         """
         metadata = metadata or {}
 
-        # 1. Naive chunking (can be improved)
-        chunks = [text[i : i + chunk_size] for i in range(0, len(text), chunk_size)]
+        # 1. Boundary-aware chunking with overlap
+        length = self._token_length() if by_tokens else len
+        overlap = chunk_size // 8 if chunk_overlap is None else chunk_overlap
+        chunks = _split_recursive(text, chunk_size, overlap, length=length)
+
+        # 2. Embed all chunks: one (N, dim) float32 matrix
+        vectors = self.embed_batch(chunks)
+
+        ids = [f"{id_prefix}_{idx}" for idx in range(len(chunks))]
+        # One dict per chunk, built in a single literal. Previews are sliced from
+        # full_text at display time instead of being stored twice.
+        base_meta = dict(metadata)
+        metas = [{**base_meta, "full_text": chunk} for chunk in chunks]
+
+        # 3. Batch Upsert
+        self.vector_api.upsert_batch_np(collection, ids, vectors, metas)
+        # answers cached for this collection may now miss the new content
+        self.clear_cache(collection)
+        return len(ids)
+
+    def clear_cache(self, collection: Optional[str] = None) -> None:
+        """Drops cached chat answers (all, or only those of `collection`)."""
+        if collection is None:
+            self._qcache.clear()
+            return
+        kept = [e for e in self._qcache if e[0][0] != collection]
+        self._qcache.clear()
+        self._qcache.extend(kept)
+
+    def _cache_lookup(self, key: Tuple[Any, ...], q: np.ndarray) -> Optional[RAGGeneration]:
+        entries = [e for e in self._qcache if e[0] == key]
+        if not entries:
+            return None
+        # cached vectors are unit-norm: one matrix-vector product gives all cosines
+        sims = np.stack([e[1] for e in entries]) @ q
+        best = int(np.argmax(sims))
+        return entries[best][2] if sims[best] >= self.cache_threshold else None
+
+    def _chat_cache_key(
+        self, collection: str, k: int, system_prompt: str, filters: Optional[Dict]
+    ) -> Tuple[Any, ...]:
+        return (
+            collection,
+            k,
+            system_prompt,
+            json.dumps(filters, sort_keys=True),
+            self.embedding_model,
+            self.llm_model,
+            self.max_context_chars,
+        )
 
-        items = []
-        for idx, chunk in enumerate(chunks):
-            # Generate ID
-            doc_id = f"{id_prefix}_{idx}"
+    @staticmethod
+    def _build_messages(
+        hits: List[SearchResult], query: str, system_prompt: str, max_chars: int = MAX_CONTEXT_CHARS
+    ) -> Tuple[List[Dict[str, str]], List[SearchResult]]:
+        """
+        Writes the user prompt into a single buffer. Hits are added in rank order
+        until `max_chars` of context is reached; the first one is always kept
+        (trimmed if needed) and only hits that made it into the prompt are sources.
+        Hits whose text repeats a better-ranked one (ignoring whitespace, e.g.
+        overlapping chunks or re-ingested docs) are skipped.
+        """
+        buf = io.StringIO()
+        buf.write("Context:\n")
+        source_docs = []
+        budget = max_chars
+        seen = set()
 
-            # Embed
-            vector = self.embed(chunk)
+        for hit in hits:
+            meta = hit.meta or {}
+            # text_snippet: collections ingested before full_text-only metadata
+            text = meta.get("full_text") or meta.get("text") or meta.get("text_snippet") or str(meta)
+            fingerprint = hashlib.blake2b(" ".join(text.split()).encode(), digest_size=8).digest()
+            if fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+            if len(text) > budget:
+                if source_docs:
+                    break
+                text = text[:budget]
+            budget -= len(text)
+            buf.write("-- Source (ID: ")
+            buf.write(hit.id)
+            buf.write("):\n")
+            buf.write(text)
+            buf.write("\n\n")
+
+            source_docs.append(msgspec.structs.replace(hit, meta=meta, content=text))
+
+        buf.write("Question:\n")
+        buf.write(query)
 
-            # Prepare metadata
-            meta = metadata.copy()
-            meta["text_snippet"] = chunk[:200] + "..."  # Store preview
-            meta["full_text"] = chunk  # Store full text for RAG context
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": buf.getvalue()},
+        ]
+        return messages, source_docs
 
-            items.append({"id": doc_id, "vector": vector, "meta": meta})
+    def _prepare_chat(
+        self, collection: str, query: str, k: int, system_prompt: str, filters: Optional[Dict]
+    ) -> Tuple[Tuple[Any, ...], np.ndarray, Optional[RAGGeneration], List[Dict[str, str]], List[SearchResult]]:
+        """Embeds the query; on a similarity-cache miss also searches and builds the messages."""
+        query_vector = self.embed(query)
+
+        cache_key = self._chat_cache_key(collection, k, system_prompt, filters)
+        q = query_vector / (np.linalg.norm(query_vector) or 1.0)
+        if self._qcache.maxlen:
+            cached = self._cache_lookup(cache_key, q)
+            if cached is not None:
+                return cache_key, q, cached, [], []
 
-        # 2. Batch Upsert
-        self.vector_api.upsert_batch(collection, items)
-        return len(items)
+        hits = self.vector_api.search_hits(
+            collection=collection,
+            vector=query_vector,
+            k=k,
+            include_meta=True,
+            filters=filters,
+        )
+        messages, source_docs = self._build_messages(hits, query, system_prompt, self.max_context_chars)
+        return cache_key, q, None, messages, source_docs
 
     def chat(
         self,
         collection: str,
         query: str,
         k: int = 5,
-        system_prompt: str = "You are a helpful assistant. Use the provided context to answer the user's question.",
+        system_prompt: str = DEFAULT_SYSTEM_PROMPT,
         filters: Optional[Dict] = None,
     ) -> RAGGeneration:
         """
@@ -140,41 +596,141 @@ class RAGClient:
         3. Constructs a prompt with context.
         4. Generates an answer using the LLM.
         """
-        # 1. Retrieve Context
-        query_vector = self.embed(query)
-
-        search_result = self.vector_api.search(
-            collection=collection,
-            vector=query_vector,
-            k=k,
-            include_meta=True,
-            filters=filters,
-        )
-
-        hits = search_result.get("hits", [])
-
-        # 2. Build Context String
-        context_parts = []
-        source_docs = []
-
-        for hit in hits:
-            meta = hit.get("meta") or {}
-            text = meta.get("full_text") or meta.get("text_snippet") or str(meta)
-            context_parts.append(f"-- Source (ID: {hit['id']}):\n{text}")
-
-            # Map to typed result
-            source_docs.append(SearchResult(id=hit["id"], score=hit["score"], meta=meta, content=text))
-
-        context_str = "\n\n".join(context_parts)
+        # 1-2. Retrieve Context and build the prompt
+        cache_key, q, cached, messages, source_docs = self._prepare_chat(collection, query, k, system_prompt, filters)
+        if cached is not None:
+            return cached
 
         # 3. Prompt LLM
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"Context:\n{context_str}\n\nQuestion:\n{query}"},
-        ]
-
         completion = self.openai.chat.completions.create(model=self.llm_model, messages=messages)
 
         answer = completion.choices[0].message.content
 
-        return RAGGeneration(answer=answer, sources=source_docs, usage=completion.usage.model_dump())
+        result = RAGGeneration(answer=answer, sources=source_docs, usage=completion.usage.model_dump())
+        if self._qcache.maxlen:
+            self._qcache.append((cache_key, q, result))
+        return result
+
+    def chat_stream(
+        self,
+        collection: str,
+        query: str,
+        k: int = 5,
+        system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+        filters: Optional[Dict] = None,
+    ) -> Iterator[Tuple[str, Optional[RAGGeneration]]]:
+        """
+        Streaming variant of chat(): yields `(delta, None)` for each answer token
+        as the LLM produces it, then a final `("", RAGGeneration)` with the full
+        answer, the sources and the usage reported by the last chunk.
+        """
+        cache_key, q, cached, messages, source_docs = self._prepare_chat(collection, query, k, system_prompt, filters)
+        if cached is not None:
+            yield cached.answer, None
+            yield "", cached
+            return
+
+        stream = self.openai.chat.completions.create(
+            model=self.llm_model,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        buf = io.StringIO()
+        usage: Dict[str, Any] = {}
+        for chunk in stream:
+            if chunk.choices:
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    buf.write(delta)
+                    yield delta, None
+            if chunk.usage is not None:
+                usage = chunk.usage.model_dump()
+
+        result = RAGGeneration(answer=buf.getvalue(), sources=source_docs, usage=usage)
+        if self._qcache.maxlen:
+            self._qcache.append((cache_key, q, result))
+        yield "", result
+
+    async def _acollection_dim(self, collection: str) -> int:
+        if collection not in self._collection_dims:
+            info = await self.async_vector_api.info(collection)
+            self._collection_dims[collection] = int(info["dim"])
+        return self._collection_dims[collection]
+
+    async def _aretrieve(
+        self,
+        collection: str,
+        query_vectors: np.ndarray,
+        k: int,
+        filters: Optional[Dict],
+    ) -> List[SearchResult]:
+        """
+        One search per query vector, all in flight at once. Hits are merged by id
+        keeping the best score, and the top `k` are returned.
+        """
+        results = await asyncio.gather(
+            *(
+                self.async_vector_api.search_hits(
+                    collection=collection, vector=v, k=k, include_meta=True, filters=filters
+                )
+                for v in query_vectors
+            )
+        )
+        best: Dict[str, SearchResult] = {}
+        for hits in results:
+            for hit in hits:
+                prev = best.get(hit.id)
+                if prev is None or hit.score > prev.score:
+                    best[hit.id] = hit
+        return sorted(best.values(), key=lambda h: h.score, reverse=True)[:k]
+
+    async def achat(
+        self,
+        collection: str,
+        query: str,
+        k: int = 5,
+        system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+        filters: Optional[Dict] = None,
+        queries: Optional[List[str]] = None,
+    ) -> RAGGeneration:
+        """
+        Async twin of chat(): the query embedding and the (first-time) collection
+        metadata fetch run concurrently, and no call blocks the event loop.
+        `queries` adds retrieval probes (rewrites, HyDE passages...): they are
+        embedded in the same batch and searched in parallel; `query` is what the LLM answers.
+        Requires `async_vector_api` (see AsyncClient).
+        """
+        if self.async_vector_api is None:
+            raise RuntimeError("achat() requires an async vector API; use rustkissvdb.AsyncClient")
+
+        probes = [query] + [p for p in dict.fromkeys(queries or []) if p != query]
+        query_vectors, dim = await asyncio.gather(
+            self.aembed_batch(probes),
+            self._acollection_dim(collection),
+        )
+        if query_vectors.shape[1] != dim:
+            raise ValueError(
+                f"Embedding dim {query_vectors.shape[1]} does not match collection '{collection}' dim {dim}"
+            )
+
+        cache_key = self._chat_cache_key(collection, k, system_prompt, filters) + (tuple(probes[1:]),)
+        q = query_vectors[0] / (np.linalg.norm(query_vectors[0]) or 1.0)
+        if self._qcache.maxlen:
+            cached = self._cache_lookup(cache_key, q)
+            if cached is not None:
+                return cached
+
+        hits = await self._aretrieve(collection, query_vectors, k, filters)
+        messages, source_docs = self._build_messages(hits, query, system_prompt, self.max_context_chars)
+
+        completion = await (await self._loop_aopenai()).chat.completions.create(model=self.llm_model, messages=messages)
+
+        result = RAGGeneration(
+            answer=completion.choices[0].message.content,
+            sources=source_docs,
+            usage=completion.usage.model_dump(),
+        )
+        if self._qcache.maxlen:
+            self._qcache.append((cache_key, q, result))
+        return result
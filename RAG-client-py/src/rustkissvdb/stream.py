@@ -1,10 +1,62 @@
 from __future__ import annotations
 
-import json
-from typing import TYPE_CHECKING, Dict, Generator, Optional
+from typing import TYPE_CHECKING, Dict, Generator, Iterator, Optional
+
+import httpx
+import msgspec
+
+from .errors import RustKissVDBError
 
 if TYPE_CHECKING:
-    from .client import Client, RustKissVDBError
+    from .client import Client
+
+
+def _parse_frame(frame: bytes) -> Dict[str, object]:
+    event: Dict[str, object] = {}
+    data = []
+    for line in frame.split(b"\n"):
+        if line.startswith(b"data:"):
+            data.append(line[5:].strip())
+        elif line.startswith(b"event:"):
+            event["event"] = line[6:].strip().decode("utf-8")
+        elif line.startswith(b"id:"):
+            event["id"] = line[3:].strip().decode("utf-8")
+    if data:
+        payload = b"\n".join(data)
+        try:
+            event["data"] = msgspec.json.decode(payload)
+        except msgspec.DecodeError:
+            event["data_raw"] = payload.decode("utf-8", errors="replace")
+    return event
+
+
+def iter_sse(resp: httpx.Response) -> Iterator[Dict[str, object]]:
+    """
+    Itera los eventos SSE de una respuesta en streaming como dicts
+    {"event", "id", "data"} (o "data_raw" si el payload no es JSON).
+
+    Trabaja sobre bytes: corta frames en la línea en blanco, solo decodifica
+    los campos presentes y parsea `data:` con msgspec. Usar dentro de
+    `with client.stream_request(...) as resp:` para liberar la conexión.
+    """
+    buf = bytearray()
+    for chunk in resp.iter_bytes(chunk_size=4096):
+        # SSE admite CRLF; el payload JSON no lleva CR crudos
+        buf += chunk.replace(b"\r", b"")
+        start = 0
+        while True:
+            end = buf.find(b"\n\n", start)
+            if end < 0:
+                break
+            event = _parse_frame(bytes(buf[start:end]))
+            start = end + 2
+            if event:
+                yield event
+        del buf[:start]
+    if buf.strip():
+        event = _parse_frame(bytes(buf))
+        if event:
+            yield event
 
 
 class StreamAPI:
@@ -28,24 +80,10 @@ class StreamAPI:
 
         with self._client.stream_request("GET", "/v1/stream", params=params) as resp:
             if resp.status_code >= 400:
-                raise RustKissVDBError(self._client._error_message(resp))
-            event: Dict[str, object] = {}
-            for line in resp.iter_lines():
-                if not line:
-                    if event:
-                        yield event
-                        event = {}
-                    continue
-                text = line.decode("utf-8")
-                if text.startswith("event:"):
-                    event["event"] = text.split(":", 1)[1].strip()
-                elif text.startswith("id:"):
-                    event["id"] = text.split(":", 1)[1].strip()
-                elif text.startswith("data:"):
-                    payload = text.split(":", 1)[1].strip()
-                    try:
-                        event["data"] = json.loads(payload)
-                    except json.JSONDecodeError:
-                        event["data_raw"] = payload
-            if event:
-                yield event
+                body = resp.read()
+                try:
+                    data = msgspec.json.decode(body)
+                except msgspec.DecodeError:
+                    data = None
+                raise RustKissVDBError(self._client._error_message(data, body))
+            yield from iter_sse(resp)
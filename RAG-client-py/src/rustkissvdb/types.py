@@ -1,6 +1,16 @@
 from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel
+import msgspec
+
+# msgspec Structs: search replies decode straight from the HTTP bytes into
+# these types (no dict -> model second pass). model_dump() keeps the
+# Pydantic-style API callers already use.
+
+
+class _Model(msgspec.Struct, kw_only=True):
+    def model_dump(self) -> Dict[str, Any]:
+        return msgspec.to_builtins(self)
+
 
 # --- Vector Models ---
 
@@ -10,7 +20,7 @@ class VectorMetric(str):
     DOT = "dot"
 
 
-class CollectionInfo(BaseModel):
+class CollectionInfo(_Model):
     collection: str
     dim: int
     metric: str
@@ -19,7 +29,7 @@ class CollectionInfo(BaseModel):
     upsert_count: int
 
 
-class SearchResult(BaseModel):
+class SearchResult(_Model, frozen=True):
     id: str
     score: float
     meta: Optional[Dict[str, Any]] = None
@@ -27,20 +37,20 @@ class SearchResult(BaseModel):
     content: Optional[str] = None
 
 
-class SearchResponse(BaseModel):
+class SearchResponse(_Model):
     hits: List[SearchResult]
 
 
 # --- RAG Models ---
 
 
-class RAGGeneration(BaseModel):
+class RAGGeneration(_Model):
     answer: str
     sources: List[SearchResult]
     usage: Dict[str, Any]
 
 
-class DocumentChunk(BaseModel):
+class DocumentChunk(_Model):
     id: str
     text: str
-    metadata: Dict[str, Any] = {}
+    metadata: Dict[str, Any] = msgspec.field(default_factory=dict)
@@ -1,9 +1,58 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Union
+
+import msgspec
+import numpy as np
+
+from ._json import json_encoder
+from .types import SearchResponse, SearchResult
 
 if TYPE_CHECKING:
-    from .client import Client
+    from .client import AsyncClient, Client
+
+
+VectorLike = Union[Sequence[float], np.ndarray]
+
+# Items por request de upsert_batch/delete_batch que acepta el server por defecto
+MAX_VECTOR_BATCH = 256
+# Bytes de body por request de upsert_batch_np: el server corta en MAX_BODY_BYTES
+# (1 MiB por defecto); se deja margen. 256 vectores de 1536 dims con ~1000 chars
+# de texto son ~8.6 MB, así que el límite real suele ser este y no el de items.
+MAX_BATCH_BYTES = 1_000_000
+_BATCH_ENVELOPE = len(b'{"items":[]}')
+
+
+def as_list(vector: VectorLike) -> List[float]:
+    """ndarray -> lista al serializar (el API recibe JSON); las listas pasan tal cual."""
+    return vector.tolist() if isinstance(vector, np.ndarray) else vector  # type: ignore[return-value]
+
+
+def round_vector(vector: VectorLike, decimals: int) -> List[float]:
+    """
+    Redondea un vector para acortar su representación JSON.
+
+    El API solo acepta vectores como listas JSON de floats; un float64 crudo ocupa
+    ~19 caracteres ("0.05234098434448242") y con 6 decimales ~8 ("0.052341"), es
+    decir, ~2x menos payload con un error (<5e-7) irrelevante para cosine/dot.
+    """
+    return np.round(np.asarray(vector, dtype=np.float64), decimals).tolist()
+
+
+_search_decoder = msgspec.json.Decoder(SearchResponse)
+
+
+def _search_payload(
+    vector: VectorLike, k: int, include_meta: bool, filters: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {
+        "vector": as_list(vector),
+        "k": int(k),
+        "include_meta": bool(include_meta),
+    }
+    if filters is not None:
+        payload["filters"] = filters
+    return payload
 
 
 class VectorAPI:
@@ -29,10 +78,10 @@ class VectorAPI:
         collection: str,
         *,
         vector_id: str,
-        vector: List[float],
+        vector: VectorLike,
         meta: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
-        payload = {"id": vector_id, "vector": vector}
+        payload = {"id": vector_id, "vector": as_list(vector)}
         if meta is not None:
             payload["meta"] = meta
         return self._client.request(
@@ -45,13 +94,72 @@ class VectorAPI:
         self,
         collection: str,
         items: List[Dict[str, Any]],
+        *,
+        decimals: Optional[int] = None,
     ) -> Dict[str, Any]:
+        if decimals is not None:
+            items = [{**it, "vector": round_vector(it["vector"], decimals)} for it in items]
+        elif any(isinstance(it["vector"], np.ndarray) for it in items):
+            items = [{**it, "vector": as_list(it["vector"])} for it in items]
         return self._client.request(
             "POST",
             f"/v1/vector/{collection}/upsert_batch",
             json={"items": items},
         )
 
+    def upsert_batch_np(
+        self,
+        collection: str,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        metas: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+        *,
+        decimals: Optional[int] = None,
+        batch_size: int = MAX_VECTOR_BATCH,
+        max_bytes: int = MAX_BATCH_BYTES,
+    ) -> Dict[str, Any]:
+        """
+        Upsert de una matriz (N, dim): la conversión a listas para el JSON es una sola
+        llamada tolist() sobre toda la matriz, no una por vector. Envía lotes de hasta
+        `batch_size` items (límite MAX_VECTOR_BATCH del server) y `max_bytes` de body,
+        y junta los `results`. Cada item se serializa una sola vez: su JSON medido
+        viaja tal cual (msgspec.Raw) dentro del body del lote.
+        """
+        mat = np.asarray(vectors, dtype=np.float32)
+        if mat.ndim != 2 or mat.shape[0] != len(ids):
+            raise ValueError(f"vectors debe ser (N, dim) con N={len(ids)}, recibido {mat.shape}")
+        if metas is not None and len(metas) != len(ids):
+            raise ValueError("metas debe tener un elemento por id")
+        rows = (np.round(mat.astype(np.float64), decimals) if decimals is not None else mat).tolist()
+
+        results: List[Dict[str, Any]] = []
+        items: List[msgspec.Raw] = []
+        size = _BATCH_ENVELOPE
+
+        def flush(items: List[msgspec.Raw]) -> None:
+            data = self._client.request(
+                "POST",
+                f"/v1/vector/{collection}/upsert_batch",
+                json={"items": items},
+            )
+            results.extend(data.get("results", []))
+
+        for i, row in enumerate(rows):
+            item: Dict[str, Any] = {"id": ids[i], "vector": row}
+            if metas is not None and metas[i] is not None:
+                item["meta"] = metas[i]
+            raw = json_encoder.encode(item)
+            # +1 por la coma; un item que solo ya excede max_bytes viaja solo
+            if items and (len(items) >= batch_size or size + len(raw) + 1 > max_bytes):
+                flush(items)
+                items = []
+                size = _BATCH_ENVELOPE
+            items.append(msgspec.Raw(raw))
+            size += len(raw) + (1 if len(items) > 1 else 0)
+        if items:
+            flush(items)
+        return {"results": results}
+
     def delete(self, collection: str, vector_id: str) -> bool:
         data = self._client.request(
             "POST",
@@ -70,21 +178,74 @@ class VectorAPI:
     def search(
         self,
         collection: str,
-        vector: List[float],
+        vector: VectorLike,
         *,
         k: int = 5,
         include_meta: bool = True,
         filters: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
-        payload: Dict[str, Any] = {
-            "vector": vector,
-            "k": int(k),
-            "include_meta": bool(include_meta),
-        }
-        if filters is not None:
-            payload["filters"] = filters
         return self._client.request(
             "POST",
             f"/v1/vector/{collection}/search",
-            json=payload,
+            json=_search_payload(vector, k, include_meta, filters),
+        )
+
+    def search_hits(
+        self,
+        collection: str,
+        vector: VectorLike,
+        *,
+        k: int = 5,
+        include_meta: bool = True,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[SearchResult]:
+        """Como search(), pero decodifica los hits directo del body a SearchResult."""
+        data = self._client.request(
+            "POST",
+            f"/v1/vector/{collection}/search",
+            json=_search_payload(vector, k, include_meta, filters),
+            decoder=_search_decoder,
+        )
+        return data.hits
+
+
+class AsyncVectorAPI:
+    """Subconjunto async de VectorAPI (lecturas) para AsyncClient."""
+
+    def __init__(self, client: AsyncClient) -> None:
+        self._client = client
+
+    async def info(self, collection: str) -> Dict[str, Any]:
+        return await self._client.request("GET", f"/v1/vector/{collection}")
+
+    async def search(
+        self,
+        collection: str,
+        vector: VectorLike,
+        *,
+        k: int = 5,
+        include_meta: bool = True,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        return await self._client.request(
+            "POST",
+            f"/v1/vector/{collection}/search",
+            json=_search_payload(vector, k, include_meta, filters),
+        )
+
+    async def search_hits(
+        self,
+        collection: str,
+        vector: VectorLike,
+        *,
+        k: int = 5,
+        include_meta: bool = True,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[SearchResult]:
+        data = await self._client.request(
+            "POST",
+            f"/v1/vector/{collection}/search",
+            json=_search_payload(vector, k, include_meta, filters),
+            decoder=_search_decoder,
         )
+        return data.hits
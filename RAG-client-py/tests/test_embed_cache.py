@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+
+from rustkissvdb import EmbeddingCache
+
+
+class EmbeddingCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache.sqlite")
+        self.cache = EmbeddingCache(self.path)
+
+    def tearDown(self) -> None:
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_get_many_returns_hits_and_misses_in_order(self) -> None:
+        self.cache.put_many("m", ["a", "c"], [[1.0, 2.0], [3.0, 4.0]])
+        got = self.cache.get_many("m", ["a", "b", "c"])
+        self.assertEqual([v.tolist() if v is not None else None for v in got], [[1.0, 2.0], None, [3.0, 4.0]])
+
+    def test_key_includes_model(self) -> None:
+        self.cache.put("m1", "a", [0.5])
+        self.assertIsNone(self.cache.get("m2", "a"))
+
+    def test_persists_vectors_and_dims_across_instances(self) -> None:
+        self.cache.put("m", "a", [0.25, -1.0])
+        self.cache.put_dim("m", 2)
+        self.cache.close()
+
+        self.cache = EmbeddingCache(self.path)
+        self.assertEqual(self.cache.get("m", "a").tolist(), [0.25, -1.0])
+        self.assertEqual(self.cache.get_dim("m"), 2)
+        self.assertIsNone(self.cache.get_dim("other"))
+
+
+if __name__ == "__main__":
+    unittest.main()
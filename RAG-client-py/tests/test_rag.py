@@ -0,0 +1,353 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import numpy as np
+
+import httpx
+from httpx import MockTransport, Request, Response
+
+from rustkissvdb import AsyncClient, Client, EmbeddingCache
+from rustkissvdb.rag import RAGClient, _split_recursive
+from rustkissvdb.types import SearchResult
+
+
+class _FakeEmbeddings:
+    def __init__(self) -> None:
+        self.calls: List[List[str]] = []
+
+    def create(self, input: List[str], model: str) -> Any:
+        self.calls.append(list(input))
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[float(len(t)), 1.0]) for t in input])
+
+
+class _FakeCompletions:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def create(self, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> Any:
+        self.calls += 1
+        if kwargs.get("stream"):
+            delta = lambda text: SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+            usage = SimpleNamespace(choices=[], usage=SimpleNamespace(model_dump=lambda: {"total_tokens": 2}))
+            return iter([delta("ans"), delta(None), delta("wer"), usage])
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f"answer {self.calls}"))],
+            usage=SimpleNamespace(model_dump=lambda: {"total_tokens": 1}),
+        )
+
+
+class _FakeOpenAI:
+    def __init__(self) -> None:
+        self.embeddings = _FakeEmbeddings()
+        self.chat = SimpleNamespace(completions=_FakeCompletions())
+
+
+class _FakeAsyncEmbeddings(_FakeEmbeddings):
+    async def create(self, input: List[str], model: str) -> Any:  # type: ignore[override]
+        return super().create(input, model)
+
+
+class _FakeAsyncCompletions(_FakeCompletions):
+    async def create(self, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> Any:  # type: ignore[override]
+        return super().create(model, messages, **kwargs)
+
+
+class _FakeAsyncOpenAI:
+    def __init__(self) -> None:
+        self.embeddings = _FakeAsyncEmbeddings()
+        self.chat = SimpleNamespace(completions=_FakeAsyncCompletions())
+        self.closed = False
+
+    async def close(self) -> None:
+        self.closed = True
+
+    async def __aenter__(self) -> "_FakeAsyncOpenAI":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        pass
+
+
+class _FakeVectorAPI:
+    def __init__(self) -> None:
+        self.upserts: List[Dict[str, Any]] = []
+        self.searches = 0
+
+    def upsert_batch(self, collection: str, items: List[Dict[str, Any]], **kwargs: Any) -> Dict[str, Any]:
+        self.upserts.extend(items)
+        return {"upserted": len(items)}
+
+    def upsert_batch_np(self, collection: str, ids: List[str], vectors: Any, metas: Any = None) -> Dict[str, Any]:
+        return self.upsert_batch(
+            collection, [{"id": i, "vector": v.tolist(), "meta": m} for i, v, m in zip(ids, vectors, metas)]
+        )
+
+    def search_hits(self, collection: str, vector: Any, k: int, **kwargs: Any) -> List[SearchResult]:
+        self.searches += 1
+        return [SearchResult(id="doc_0", score=0.9, meta={"full_text": "context"})]
+
+
+class RAGClientTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.openai = _FakeOpenAI()
+        self.vector = _FakeVectorAPI()
+        self.rag = RAGClient(vector_api=self.vector, openai_client=self.openai, cache_size=256)
+        self.aopenai = _FakeAsyncOpenAI()
+        self.rag._async_openai = lambda: self.aopenai  # type: ignore[method-assign]
+
+    def test_embed_single_text_returns_one_vector(self) -> None:
+        vector = self.rag.embed("abc")
+        self.assertEqual(vector.dtype, np.float32)
+        self.assertEqual(vector.tolist(), [3.0, 1.0])
+
+    def test_embed_batch_flattens_line_breaks_and_tabs(self) -> None:
+        self.rag.embed_batch(["a\nb\r\nc\td"])
+        self.assertEqual(self.openai.embeddings.calls, [["a b  c d"]])
+
+    def test_embed_list_of_one_returns_list_of_vectors(self) -> None:
+        self.assertEqual(self.rag.embed(["abc"]).tolist(), [[3.0, 1.0]])
+        self.assertEqual(self.rag.embed_batch(["abc"]).shape, (1, 2))
+
+    def test_ingest_text_embeds_all_chunks_in_one_call(self) -> None:
+        n = self.rag.ingest_text("docs", "x" * 25, chunk_size=10)
+        self.assertEqual(n, 3)
+        self.assertEqual(len(self.openai.embeddings.calls), 1)
+        self.assertEqual([it["id"] for it in self.vector.upserts], ["doc_0", "doc_1", "doc_2"])
+        self.assertEqual(self.vector.upserts[2]["vector"], [5.0, 1.0])
+        self.assertEqual(self.vector.upserts[2]["meta"], {"full_text": "x" * 5})
+
+    def test_embed_batch_packs_sub_batches_and_keeps_order(self) -> None:
+        self.rag.embed_batch_tokens = 8
+        texts = ["a" * 30, "b", "c" * 20, "d" * 8]
+        vectors = self.rag.embed_batch(texts)
+        self.assertEqual(vectors[:, 0].tolist(), [30.0, 1.0, 20.0, 8.0])
+        self.assertEqual(self.openai.embeddings.calls, [])
+        # shortest first: "b" and "d"*8 share a batch, the long ones go alone
+        self.assertEqual(self.aopenai.embeddings.calls, [["b", "dddddddd"], ["c" * 20], ["a" * 30]])
+
+    def test_chat_reuses_answer_for_similar_query(self) -> None:
+        first = self.rag.chat("docs", "abc")
+        # same length -> same fake embedding -> cosine 1.0
+        again = self.rag.chat("docs", "xyz")
+        self.assertIs(again, first)
+        self.assertEqual(self.vector.searches, 1)
+        self.assertEqual(self.openai.chat.completions.calls, 1)
+
+    def test_chat_cache_is_opt_in(self) -> None:
+        rag = RAGClient(vector_api=self.vector, openai_client=self.openai)
+        self.assertEqual(rag.cache_size, 0)
+        rag.chat("docs", "abc")
+        rag.chat("docs", "xyz")
+        self.assertEqual(self.openai.chat.completions.calls, 2)
+
+        rag.cache_size = 8
+        first = rag.chat("docs", "abc")
+        self.assertIs(rag.chat("docs", "xyz"), first)
+        # a different context budget is a different prompt
+        rag.max_context_chars = 10
+        self.assertIsNot(rag.chat("docs", "xyz"), first)
+
+    def test_chat_stream_yields_deltas_then_generation(self) -> None:
+        items = list(self.rag.chat_stream("docs", "abc"))
+        self.assertEqual([d for d, _ in items], ["ans", "wer", ""])
+        self.assertTrue(all(final is None for _, final in items[:-1]))
+        final = items[-1][1]
+        self.assertEqual(final.answer, "answer")
+        self.assertEqual(final.usage, {"total_tokens": 2})
+        self.assertEqual([src.content for src in final.sources], ["context"])
+
+        # a similar query replays the cached answer
+        self.assertEqual([d for d, _ in self.rag.chat_stream("docs", "xyz")], ["answer", ""])
+        self.assertEqual(self.openai.chat.completions.calls, 1)
+
+    def test_build_messages_stops_at_context_budget(self) -> None:
+        hits = [SearchResult(id=str(i), score=1.0, meta={"full_text": c * 6}) for i, c in enumerate("abc")]
+        messages, sources = RAGClient._build_messages(hits, "q?", "sys", max_chars=14)
+        self.assertEqual([src.id for src in sources], ["0", "1"])
+        self.assertEqual(
+            messages[1]["content"],
+            "Context:\n-- Source (ID: 0):\naaaaaa\n\n-- Source (ID: 1):\nbbbbbb\n\nQuestion:\nq?",
+        )
+        # the top hit is always kept, trimmed to the budget
+        _, sources = RAGClient._build_messages(hits, "q?", "sys", max_chars=4)
+        self.assertEqual([src.content for src in sources], ["aaaa"])
+
+    def test_build_messages_drops_duplicate_texts(self) -> None:
+        hits = [
+            SearchResult(id="a", score=0.9, meta={"full_text": "same  text\nhere"}),
+            SearchResult(id="b", score=0.8, meta={"full_text": "same text here "}),
+            SearchResult(id="c", score=0.7, meta={"full_text": "other"}),
+        ]
+        messages, sources = RAGClient._build_messages(hits, "q?", "sys")
+        self.assertEqual([src.id for src in sources], ["a", "c"])
+        self.assertNotIn("ID: b", messages[1]["content"])
+
+    def test_chat_cache_is_scoped_and_cleared_by_ingest(self) -> None:
+        self.rag.chat("docs", "abc")
+        self.rag.chat("other", "abc")
+        self.assertEqual(self.vector.searches, 2)
+
+        self.rag.ingest_text("docs", "new content")
+        self.assertEqual(self.rag.chat("docs", "abc").answer, "answer 3")
+        self.rag.chat("other", "abc")
+        self.assertEqual(self.openai.chat.completions.calls, 3)
+
+    def test_async_client_is_closed_when_the_event_loop_changes(self) -> None:
+        made: List[_FakeAsyncOpenAI] = []
+        self.rag._async_openai = lambda: made.append(_FakeAsyncOpenAI()) or made[-1]  # type: ignore[method-assign]
+        first = asyncio.run(self.rag._loop_aopenai())
+        second = asyncio.run(self.rag._loop_aopenai())
+        self.assertIsNot(first, second)
+        self.assertTrue(first.closed)
+        self.assertFalse(second.closed)
+
+    def test_close_only_closes_owned_openai_pool(self) -> None:
+        owned = RAGClient(vector_api=self.vector)
+        http = owned.openai._client
+        self.assertIsInstance(http, httpx.Client)
+        self.assertFalse(http.is_closed)
+        owned.close()
+        self.assertTrue(http.is_closed)
+        self.rag.close()  # injected fake: nothing to close, must not fail
+
+    def test_model_dimension_skips_probe_for_known_models(self) -> None:
+        self.rag.embedding_model = "embeddinggemma:300m"
+        self.assertEqual(self.rag.get_model_dimension(), 768)
+        self.assertEqual(self.openai.embeddings.calls, [])
+
+    def test_model_dimension_probe_is_persisted_in_cache(self) -> None:
+        self.rag.embedding_model = "custom-model"
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.sqlite")
+            with EmbeddingCache(path) as cache:
+                self.rag.embedding_cache = cache
+                self.assertEqual(self.rag.get_model_dimension(), 2)
+            with EmbeddingCache(path) as cache:
+                other = RAGClient(vector_api=self.vector, openai_client=_FakeOpenAI(), embedding_cache=cache)
+                other.embedding_model = "custom-model"
+                self.assertEqual(other.get_model_dimension(), 2)
+                self.assertEqual(other.openai.embeddings.calls, [])
+        self.assertEqual(len(self.openai.embeddings.calls), 1)
+
+    def test_embed_batch_only_sends_cache_misses(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = EmbeddingCache(os.path.join(tmp, "cache.sqlite"))
+            self.rag.embedding_cache = cache
+            try:
+                self.rag.embed_batch(["ab", "cde"])
+                vectors = self.rag.embed_batch(["cde", "fghi", "ab"])
+            finally:
+                cache.close()
+        self.assertEqual(self.openai.embeddings.calls, [["ab", "cde"], ["fghi"]])
+        self.assertEqual(vectors[:, 0].tolist(), [3.0, 4.0, 2.0])
+
+
+class IngestBatchSizeTests(unittest.TestCase):
+    def test_ingest_text_splits_upserts_under_server_body_limit(self) -> None:
+        bodies: List[bytes] = []
+
+        def handler(request: Request) -> Response:
+            bodies.append(request.content)
+            items = json.loads(request.content)["items"]
+            return Response(200, json={"results": [{"status": "upserted", "id": it["id"]} for it in items]})
+
+        client = Client("http://test", api_key="dev", timeout=1.0)
+        client._http.close()
+        client._http = httpx.Client(base_url="http://test", transport=MockTransport(handler))
+        # text-embedding-3-small sized vectors
+        rng = np.random.default_rng(0)
+        client.rag.openai.close()
+        client.rag.openai = SimpleNamespace(
+            close=lambda: None,
+            embeddings=SimpleNamespace(
+                create=lambda input, model: SimpleNamespace(
+                    data=[SimpleNamespace(embedding=rng.random(1536).tolist()) for _ in input]
+                )
+            )
+        )
+        client.rag.embed_batch_tokens = 10**9
+        try:
+            n = client.rag.ingest_text("docs", "lorem ipsum dolor sit amet " * 2000, chunk_size=1000)
+        finally:
+            client.close()
+
+        self.assertGreater(len(bodies), 1)
+        self.assertTrue(all(len(b) < 1_048_576 for b in bodies))
+        self.assertEqual(sum(len(json.loads(b)["items"]) for b in bodies), n)
+
+
+class AsyncChatTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.requests: List[str] = []
+
+        def handler(request: Request) -> Response:
+            self.requests.append(f"{request.method} {request.url.path}")
+            if request.url.path == "/v1/vector/docs":
+                return Response(200, json={"collection": "docs", "dim": 2, "metric": "cosine"})
+            if request.url.path == "/v1/vector/docs/search":
+                # the fake embedding's first component is the text length: use it as a probe tag
+                probe = int(json.loads(request.content)["vector"][0])
+                hits = [
+                    {"id": "a", "score": 0.5 + probe / 100, "meta": {"full_text": "ctx"}},
+                    {"id": f"only_{probe}", "score": 0.1, "meta": {"full_text": f"ctx {probe}"}},
+                ]
+                return Response(200, json={"hits": hits})
+            return Response(404, json={"error": "not_found", "message": "missing"})
+
+        self.client = AsyncClient("http://test", api_key="dev", timeout=1.0)
+        await self.client._http.aclose()
+        self.client._http = httpx.AsyncClient(base_url="http://test", transport=MockTransport(handler))
+        self.aopenai = _FakeAsyncOpenAI()
+        self.client.rag._async_openai = lambda: self.aopenai  # type: ignore[method-assign]
+
+    async def asyncTearDown(self) -> None:
+        await self.client.aclose()
+
+    async def test_achat_searches_and_answers(self) -> None:
+        result = await self.client.rag.achat("docs", "abc")
+        self.assertEqual(result.answer, "answer 1")
+        self.assertEqual([src.content for src in result.sources], ["ctx", "ctx 3"])
+        self.assertEqual(self.requests, ["GET /v1/vector/docs", "POST /v1/vector/docs/search"])
+
+        # collection metadata is fetched once per client
+        await self.client.rag.achat("docs", "another question")
+        self.assertEqual(self.requests.count("GET /v1/vector/docs"), 1)
+
+    async def test_achat_merges_parallel_probes_by_best_score(self) -> None:
+        result = await self.client.rag.achat("docs", "abc", k=2, queries=["abcdefghij", "abc"])
+        self.assertEqual(self.requests.count("POST /v1/vector/docs/search"), 2)
+        # "a" comes back from both probes: kept once, with the better score
+        self.assertEqual([(s.id, s.score) for s in result.sources], [("a", 0.6), ("only_3", 0.1)])
+
+
+class SplitRecursiveTests(unittest.TestCase):
+    def test_prefers_paragraph_boundaries(self) -> None:
+        text = "alpha beta.\n\ngamma delta.\n\nepsilon"
+        self.assertEqual(_split_recursive(text, 15), ["alpha beta.", "gamma delta.", "epsilon"])
+
+    def test_overlap_carries_trailing_words(self) -> None:
+        chunks = _split_recursive("one two three four five six", 14, overlap=5)
+        self.assertEqual(chunks, ["one two three", "three four", "four five six"])
+        self.assertTrue(all(len(c) <= 14 for c in chunks))
+
+    def test_hard_cuts_text_without_separators(self) -> None:
+        self.assertEqual(_split_recursive("x" * 25, 10), ["x" * 10, "x" * 10, "x" * 5])
+
+    def test_char_fast_path_matches_generic_length(self) -> None:
+        text = "Lorem ipsum dolor. Sit amet\nconsectetur adipiscing.\n\n" * 20 + "z" * 70
+        for chunk_size, overlap in [(10, 0), (25, 7), (40, 12), (120, 30)]:
+            self.assertEqual(
+                _split_recursive(text, chunk_size, overlap),
+                _split_recursive(text, chunk_size, overlap, length=lambda s: len(s)),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import unittest
+
+import httpx
+from httpx import MockTransport, Request, Response
+
+from rustkissvdb import Client, RustKissVDBError
+from rustkissvdb.stream import iter_sse
+
+
+class _Chunks(httpx.SyncByteStream):
+    def __init__(self, chunks) -> None:
+        self._chunks = chunks
+
+    def __iter__(self):
+        yield from self._chunks
+
+
+# frames split at awkward places, CRLF framing, a keep-alive comment and a non-JSON payload
+_SSE_CHUNKS = [
+    b'event: state_updated\r\nid: 1\r\ndata: {"key": "a", ',
+    b'"rev": 1}\r\n\r\n: keep-alive\n\n',
+    b"event: ping\nid: 2\ndata: not json\n",
+    b"\nid: 3\ndata: [1,\ndata: 2]",
+]
+
+
+def _client_with_transport(handler) -> Client:
+    client = Client("http://test", api_key="dev", timeout=1.0)
+    client._http.close()
+    client._http = httpx.Client(
+        base_url="http://test",
+        timeout=1.0,
+        headers={"Authorization": "Bearer dev"},
+        transport=MockTransport(handler),
+    )
+    return client
+
+
+class StreamAPITests(unittest.TestCase):
+    def test_events_parse_sse_frames(self) -> None:
+        def handler(request: Request) -> Response:
+            self.assertEqual(request.url.params["since"], "5")
+            return Response(200, headers={"content-type": "text/event-stream"}, stream=_Chunks(_SSE_CHUNKS))
+
+        client = _client_with_transport(handler)
+        try:
+            events = list(client.stream.events(since=5))
+        finally:
+            client.close()
+        self.assertEqual(
+            events,
+            [
+                {"event": "state_updated", "id": "1", "data": {"key": "a", "rev": 1}},
+                {"event": "ping", "id": "2", "data_raw": "not json"},
+                {"id": "3", "data": [1, 2]},
+            ],
+        )
+
+    def test_events_error_raises_sdk_error(self) -> None:
+        client = _client_with_transport(
+            lambda request: Response(401, json={"error": "unauthorized", "message": "bad token"})
+        )
+        try:
+            with self.assertRaises(RustKissVDBError) as exc:
+                next(client.stream.events())
+        finally:
+            client.close()
+        self.assertEqual(str(exc.exception), "unauthorized - bad token")
+
+    def test_iter_sse_on_stream_request(self) -> None:
+        client = _client_with_transport(lambda request: Response(200, content=b"data: {}\n\n"))
+        try:
+            with client.stream_request("GET", "/v1/stream") as resp:
+                self.assertEqual(list(iter_sse(resp)), [{"data": {}}])
+        finally:
+            client.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
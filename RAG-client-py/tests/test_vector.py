@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import json
+
 import httpx
+import numpy as np
 from httpx import MockTransport, Request, Response
 
 import unittest
 
 from rustkissvdb import Client, RustKissVDBError
+from rustkissvdb.types import SearchResult
 
 
 def _mock_transport() -> MockTransport:
@@ -20,6 +24,18 @@ def _mock_transport() -> MockTransport:
                 200,
                 json={"collection": "docs", "dim": 3, "metric": "cosine", "count": 0},
             )
+        if request.method == "POST" and request.url.path == "/v1/vector/docs/upsert_batch":
+            # eco del body para inspeccionar lo que viaja por la red (+ "results" como el server)
+            body = json.loads(request.content)
+            results = [{"status": "upserted", "id": it["id"], "meta": it.get("meta")} for it in body["items"]]
+            return Response(200, json={**body, "results": results})
+        if request.method == "POST" and request.url.path == "/v1/vector/docs/search":
+            hits = [{"id": "a", "score": 1, "meta": {"p": 1}, "extra": True}]
+            return Response(200, json={"hits": hits})
+        if request.url.path == "/v1/vector/docs/no_content":
+            return Response(204)
+        if request.url.path == "/v1/vector/docs/plain_error":
+            return Response(502, text="bad gateway")
         if request.method == "GET" and request.url.path.startswith("/v1/vector/"):
             return Response(404, json={"error": "not_found", "message": "collection not found"})
         return Response(500, json={"error": "internal", "message": "unexpected"})
@@ -60,6 +76,54 @@ class VectorAPITests(unittest.TestCase):
             self.client.vector.info("missing")
         self.assertIn("not_found", str(exc.exception))
 
+    def test_upsert_batch_rounds_vectors_on_the_wire(self) -> None:
+        items = [{"id": "a", "vector": [0.05234098434448242, -0.1], "meta": {"p": 1}}]
+        sent = self.client.vector.upsert_batch("docs", items, decimals=6)
+        self.assertEqual(sent["items"], [{"id": "a", "vector": [0.052341, -0.1], "meta": {"p": 1}}])
+        # el caller conserva sus vectores originales
+        self.assertEqual(items[0]["vector"][0], 0.05234098434448242)
+
+        sent = self.client.vector.upsert_batch("docs", items)
+        self.assertEqual(sent["items"][0]["vector"][0], 0.05234098434448242)
+
+    def test_upsert_batch_accepts_numpy_vectors(self) -> None:
+        items = [{"id": "a", "vector": np.asarray([0.5, -0.25], dtype=np.float32)}]
+        sent = self.client.vector.upsert_batch("docs", items)
+        self.assertEqual(sent["items"][0]["vector"], [0.5, -0.25])
+
+    def test_upsert_batch_np_sends_matrix_rows_in_server_sized_batches(self) -> None:
+        vectors = np.arange(6, dtype=np.float32).reshape(3, 2)
+        out = self.client.vector.upsert_batch_np("docs", ["a", "b", "c"], vectors, [{"p": 1}, None, None], batch_size=2)
+        self.assertEqual([r["id"] for r in out["results"]], ["a", "b", "c"])
+        self.assertEqual([r["meta"] for r in out["results"]], [{"p": 1}, None, None])
+        with self.assertRaises(ValueError):
+            self.client.vector.upsert_batch_np("docs", ["a"], vectors)
+
+    def test_upsert_batch_np_splits_batches_by_body_size(self) -> None:
+        vectors = np.zeros((5, 4), dtype=np.float32)
+        metas = [{"full_text": "x" * 100}] * 5
+        out = self.client.vector.upsert_batch_np("docs", list("abcde"), vectors, metas, max_bytes=300)
+        self.assertEqual([r["id"] for r in out["results"]], list("abcde"))
+        self.assertEqual([r["meta"] for r in out["results"]], metas)
+
+    def test_request_body_encodes_numpy_values(self) -> None:
+        payload = {"items": [{"id": "a", "vector": np.asarray([0.5, -0.25], dtype=np.float32), "meta": {"p": np.int64(3)}}]}
+        sent = self.client.request("POST", "/v1/vector/docs/upsert_batch", json=payload)
+        self.assertEqual(sent["items"], [{"id": "a", "vector": [0.5, -0.25], "meta": {"p": 3}}])
+
+    def test_no_content_response_returns_none(self) -> None:
+        self.assertIsNone(self.client.request("POST", "/v1/vector/docs/no_content"))
+
+    def test_error_message_falls_back_to_raw_body(self) -> None:
+        with self.assertRaises(RustKissVDBError) as exc:
+            self.client.request("GET", "/v1/vector/docs/plain_error")
+        self.assertEqual(str(exc.exception), "bad gateway")
+
+    def test_search_hits_decode_into_search_results(self) -> None:
+        hits = self.client.vector.search_hits("docs", [0.1, 0.2, 0.3], k=1)
+        self.assertEqual(hits, [SearchResult(id="a", score=1.0, meta={"p": 1})])
+        self.assertEqual(hits[0].model_dump(), {"id": "a", "score": 1.0, "meta": {"p": 1}, "content": None})
+
 
 if __name__ == "__main__":
     unittest.main()